@@ -14,6 +14,11 @@ class Config:
     MYSQL_USER = os.getenv('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', '')
     MYSQL_DATABASE = os.getenv('MYSQL_DATABASE', 'digit_curriculum')
+    MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', '5'))
+    MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', '10'))  # seconds to wait for a free connection
+    MYSQL_PING_INTERVAL = float(os.getenv('MYSQL_PING_INTERVAL', '30'))  # ping connections idle longer than this
+    MYSQL_RETRY_INTERVAL = float(os.getenv('MYSQL_RETRY_INTERVAL', '5'))  # seconds between connect attempts while MySQL is down
+    MYSQL_FETCH_SIZE = int(os.getenv('MYSQL_FETCH_SIZE', '1000'))  # rows per fetch from streaming (unbuffered) cursors
     
     QDRANT_URL = os.getenv('QDRANT_URL')
     QDRANT_API_KEY = os.getenv('QDRANT_API_KEY')
@@ -24,9 +29,74 @@ class Config:
     # Embedding Model
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
     VECTOR_SIZE = 384
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+    QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '1024'))
+    
+    # Multi-vector indexing: description, learning outcome and weekly topic chunks per course
+    CHUNK_INDEXING = os.getenv('CHUNK_INDEXING', '1') == '1'
+    CHUNK_CHARS = int(os.getenv('CHUNK_CHARS', '500'))
+    CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '100'))
+    INDEX_WINDOW = int(os.getenv('INDEX_WINDOW', '2048'))  # chunks encoded / uploaded per window
+    
+    # Vector backend: 'qdrant' (Qdrant Cloud) or 'local' (in-process NumPy index)
+    VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'qdrant')
+    # Seconds a collection version read from Qdrant is reused before asking again
+    COLLECTION_VERSION_TTL = float(os.getenv('COLLECTION_VERSION_TTL', '30'))
+    
+    # Approximate search in the local backend (IVF cells over int8 codes, exact re-score)
+    ANN_INDEX = os.getenv('ANN_INDEX', '1') == '1'
+    ANN_MIN_POINTS = int(os.getenv('ANN_MIN_POINTS', '20000'))  # exact search below this
+    ANN_NLIST = int(os.getenv('ANN_NLIST', '0'))  # 0 = 4 * sqrt(points)
+    ANN_NPROBE = int(os.getenv('ANN_NPROBE', '16'))
+    ANN_REFINE = int(os.getenv('ANN_REFINE', '4'))
+    
+    # On-disk embedding artifact written by the indexer, read by the local backend
+    EMBEDDING_STORE_DIR = os.getenv(
+        'EMBEDDING_STORE_DIR',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts', 'embeddings')
+    )
+    
+    # Course name resolver: how often (seconds) to check the course table for changes, 0 = never
+    COURSE_RESOLVER_CHECK_INTERVAL = int(os.getenv('COURSE_RESOLVER_CHECK_INTERVAL', '300'))
+    
+    # Study planner
+    MAX_CREDITS_PER_SEMESTER = int(os.getenv('MAX_CREDITS_PER_SEMESTER', '24'))
+    # course_relationship IDs that mean "hard prerequisite" (comma-separated); empty = look them up by name
+    PREREQUISITE_RELATIONSHIP_IDS = [int(i) for i in os.getenv('PREREQUISITE_RELATIONSHIP_IDS', '').split(',') if i.strip()]
+    
+    # Answer generation for HybridRAG: 'openrouter' (API) or 'local' (LocalSLM behind the micro-batcher)
+    SLM_BACKEND = os.getenv('SLM_BACKEND', 'openrouter')
+    LOCAL_SLM_MODEL = os.getenv('LOCAL_SLM_MODEL', 'Qwen/Qwen2.5-1.5B-Instruct')
+    
+    # Local SLM: reuse the system-prompt KV cache across requests
+    LOCAL_SLM_PREFIX_CACHE = os.getenv('LOCAL_SLM_PREFIX_CACHE', '1') == '1'
+    # Micro-batching: concurrent questions arriving within the wait window share one generate call
+    LOCAL_SLM_MAX_BATCH = int(os.getenv('LOCAL_SLM_MAX_BATCH', '8'))
+    LOCAL_SLM_MAX_WAIT_MS = float(os.getenv('LOCAL_SLM_MAX_WAIT_MS', '20'))
+    # CPU-only machines: 'fp32', 'bf16' or 'int8' (dynamic quantization); 0 threads = torch default
+    LOCAL_SLM_CPU_MODE = os.getenv('LOCAL_SLM_CPU_MODE', 'fp32')
+    LOCAL_SLM_THREADS = int(os.getenv('LOCAL_SLM_THREADS', '0'))
     
     # RAG Settings
     TOP_K = 5
+    # Hybrid retrieval: dense + BM25 candidates per side, fused with reciprocal rank fusion
+    HYBRID_SEARCH = os.getenv('HYBRID_SEARCH', '1') == '1'
+    HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '20'))
+    RRF_K = int(os.getenv('RRF_K', '60'))
+    # Optional cross-encoder rerank of the fused candidates (skipped when over budget)
+    RERANK = os.getenv('RERANK', '0') == '1'
+    RERANK_MODEL = os.getenv('RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+    RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', '30'))
+    RERANK_BUDGET_MS = float(os.getenv('RERANK_BUDGET_MS', '150'))  # 0 = no budget
+    RERANK_CACHE_SIZE = int(os.getenv('RERANK_CACHE_SIZE', '4096'))
+    ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '512'))
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', '3600'))  # seconds, 0 = no expiry
+    
+    # HTTP service (server.py)
+    SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '1'))
+    REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', '30'))  # seconds
 
 # Test if config loads correctly
 if __name__ == "__main__":
@@ -0,0 +1,318 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import zipfile
+from contextlib import contextmanager
+
+import numpy as np
+
+from config import Config
+
+
+ANN_FORMAT_VERSION = 1
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive lock across processes (e.g. pre-forked server workers)
+
+    Degrades to no lock where fcntl is unavailable or the lock file can't
+    be created; callers must still be correct then, just less efficient.
+    """
+    try:
+        import fcntl
+        f = open(path, "a")
+    except (ImportError, OSError):
+        yield
+        return
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+    finally:
+        f.close()
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate index over int8-quantized vectors
+
+    Spherical k-means splits the (L2-normalized) vectors into nlist cells.
+    A query scores the centroids, scans only the nprobe closest cells using
+    int8 codes (a quarter of the float32 bytes), then re-scores the best
+    limit * refine candidates exactly against the float32 rows.
+
+    Rows are aligned with LocalCollection rows: add() writes at a row index,
+    move() mirrors the collection's swap-delete. Cells are kept as CSR
+    (rows sorted by cell). Rows added since the last rebuild sit in an
+    unsorted tail that every query scans; the CSR is rebuilt when the tail
+    grows past rebuild_fraction of the index or after deletes. The CSR is
+    one (sorted_rows, offsets, sealed) tuple swapped in whole, and rebuilds
+    are serialized, so concurrent searches never mix two versions.
+    """
+
+    def __init__(self, centroids, scale, nprobe=None, refine=None, rebuild_fraction=0.1):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.nlist, self.vector_size = self.centroids.shape
+        self.nprobe = nprobe or Config.ANN_NPROBE
+        self.refine = refine or Config.ANN_REFINE
+        self.rebuild_fraction = rebuild_fraction
+
+        self.codes = np.zeros((1024, self.vector_size), dtype=np.int8)
+        self.assign = np.zeros(1024, dtype=np.int32)
+        self.count = 0
+
+        # (sorted_rows, offsets, sealed): rows [0, sealed) sorted by cell
+        self.cells = (np.zeros(0, dtype=np.int32), np.zeros(self.nlist + 1, dtype=np.int64), 0)
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    # ========== BUILD ==========
+
+    @classmethod
+    def train(cls, vectors, nlist=None, nprobe=None, refine=None, iterations=8, seed=0):
+        """Train centroids and the int8 scale on (a sample of) vectors, then add all rows"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        nlist = nlist or Config.ANN_NLIST or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, size=min(n, nlist * 32), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = cls._nearest(sample, centroids)
+            counts = np.bincount(assign, minlength=nlist)
+            order = np.argsort(assign, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums = np.zeros_like(centroids)
+            nonempty = counts > 0
+            sums[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+            empty = counts == 0
+            # Re-seed empty cells with random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        # Per-dimension symmetric int8 range
+        scale = np.abs(sample).max(axis=0) / 127
+        scale[scale == 0] = 1.0
+
+        index = cls(centroids, scale, nprobe, refine)
+        index.add(np.arange(n), vectors)
+        index.rebuild()
+        return index
+
+    @staticmethod
+    def _nearest(vectors, centroids, chunk=8192):
+        assign = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk):
+            assign[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        return assign
+
+    def quantize(self, vectors):
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def _ensure_capacity(self, needed):
+        capacity = len(self.assign)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        codes = np.zeros((capacity, self.vector_size), dtype=np.int8)
+        codes[:self.count] = self.codes[:self.count]
+        assign = np.zeros(capacity, dtype=np.int32)
+        assign[:self.count] = self.assign[:self.count]
+        self.codes, self.assign = codes, assign
+
+    def add(self, rows, vectors):
+        """Insert or overwrite rows (normalized vectors) at the given row indices"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self._ensure_capacity(int(rows.max()) + 1)
+
+        self.codes[rows] = self.quantize(vectors)
+        self.assign[rows] = self._nearest(vectors, self.centroids)
+        if (rows < self.cells[2]).any():
+            # A sorted row changed cell
+            self.dirty = True
+        self.count = max(self.count, int(rows.max()) + 1)
+
+    def move(self, source, target):
+        """Row source now lives at target (LocalCollection swap-delete)"""
+        self.codes[target] = self.codes[source]
+        self.assign[target] = self.assign[source]
+        self.dirty = True
+
+    def truncate(self, count):
+        self.count = count
+        self.dirty = True
+
+    def rebuild(self):
+        with self.lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Cleared first, so a write that lands during the rebuild marks it dirty again
+        self.dirty = False
+        count = self.count
+        assign = self.assign[:count]
+        sorted_rows = np.argsort(assign, kind="stable").astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.nlist))]).astype(np.int64)
+        self.cells = (sorted_rows, offsets, count)
+
+    def _stale(self, cells):
+        return self.dirty or self.count - cells[2] > max(1024, self.rebuild_fraction * self.count)
+
+    def current_cells(self):
+        """CSR tuple for a search, rebuilt first (once, under the lock) if stale"""
+        cells = self.cells
+        if not self._stale(cells):
+            return cells
+        with self.lock:
+            if self._stale(self.cells):
+                self._rebuild()
+            return self.cells
+
+    # ========== SEARCH ==========
+
+    def search(self, query, vectors, limit, nprobe=None, refine=None):
+        """
+        (rows, scores) of the approximate top-limit rows
+
+        query must be L2-normalized; vectors are the float32 rows used for the
+        exact re-scoring step.
+        """
+        sorted_rows, offsets, sealed = self.current_cells()
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        refine = refine or self.refine
+
+        cell_scores = self.centroids @ query
+        cells = np.argpartition(-cell_scores, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        parts = [sorted_rows[offsets[c]:offsets[c + 1]] for c in cells]
+        parts.append(np.arange(sealed, self.count, dtype=np.int32))
+        candidates = np.concatenate(parts)
+        if len(candidates) == 0:
+            return candidates, np.zeros(0, dtype=np.float32)
+
+        approx = self.codes[candidates].astype(np.float32) @ (query * self.scale)
+        k = min(len(candidates), limit * refine)
+        if k < len(candidates):
+            candidates = candidates[np.argpartition(-approx, k - 1)[:k]]
+
+        exact = vectors[candidates] @ query
+        k = min(limit, len(candidates))
+        top = np.argpartition(-exact, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+        top = top[np.argsort(-exact[top], kind="stable")]
+        return candidates[top], exact[top]
+
+    # ========== PERSISTENCE ==========
+
+    def save(self, path):
+        """Write to a temp file next to path, then rename it into place (readers never see a partial file)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    format_version=ANN_FORMAT_VERSION,
+                    centroids=self.centroids,
+                    scale=self.scale,
+                    codes=self.codes[:self.count],
+                    assign=self.assign[:self.count],
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path, nprobe=None, refine=None):
+        """Saved index, or None if missing / unreadable / written by another format version"""
+        try:
+            with np.load(path) as data:
+                if int(data["format_version"]) != ANN_FORMAT_VERSION:
+                    return None
+                centroids, scale = data["centroids"], data["scale"]
+                codes, assign = data["codes"], data["assign"]
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return None
+
+        index = cls(centroids, scale, nprobe, refine)
+        index._ensure_capacity(len(assign))
+        index.codes[:len(assign)] = codes
+        index.assign[:len(assign)] = assign
+        index.count = len(assign)
+        index.rebuild()
+        return index
+
+    def stats(self):
+        return {
+            'count': self.count,
+            'nlist': self.nlist,
+            'nprobe': self.nprobe,
+            'refine': self.refine,
+            'code_bytes': self.count * self.vector_size,
+        }
+
+
+# Benchmark: recall / latency knobs against exact search
+if __name__ == "__main__":
+    import time
+    from data.embedding_store import EmbeddingStore
+    from data.local_index import normalize_rows
+
+    print("=" * 60)
+    print("Testing IVF-int8 ANN Index...")
+    print("=" * 60)
+    print()
+
+    rng = np.random.default_rng(0)
+    loaded = EmbeddingStore().load(mmap=False) if "--synthetic" not in sys.argv else None
+    if loaded:
+        _, _, vectors, _ = loaded
+        vectors = np.ascontiguousarray(vectors)
+        # Paraphrase-like queries: stored course vectors plus noise
+        queries = normalize_rows(vectors[rng.choice(len(vectors), 200)] + 0.05 * rng.standard_normal((200, vectors.shape[1])))
+        print(f"📦 curriculum collection: {len(vectors)} vectors")
+    else:
+        n = int(sys.argv[sys.argv.index("--synthetic") + 1]) if "--synthetic" in sys.argv[:-1] else 100000
+        centers = rng.standard_normal((500, Config.VECTOR_SIZE)).astype(np.float32)
+        vectors = normalize_rows(centers[rng.integers(0, 500, n)] + 1.0 * rng.standard_normal((n, Config.VECTOR_SIZE)).astype(np.float32))
+        queries = normalize_rows(centers[rng.integers(0, 500, 200)] + 1.0 * rng.standard_normal((200, Config.VECTOR_SIZE)).astype(np.float32))
+        print(f"🧪 Synthetic clustered vectors: {n}")
+
+    limit = 10
+    start = time.perf_counter()
+    exact_top = []
+    for q in queries:
+        scores = vectors @ q
+        exact_top.append(set(np.argpartition(-scores, limit - 1)[:limit].tolist()))
+    exact_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    start = time.perf_counter()
+    index = IVFIndex.train(vectors)
+    print(f"⏱️  Build: {time.perf_counter() - start:.2f}s ({index.nlist} cells)")
+    print(f"💾 int8 codes: {index.count * index.vector_size / 1e6:.1f} MB vs float32 {vectors.nbytes / 1e6:.1f} MB")
+    print(f"⏱️  Exact search: {exact_ms:.3f} ms/query\n")
+
+    for nprobe in (1, 4, 8, 16, 32):
+        for refine in (2, 4):
+            start = time.perf_counter()
+            hits = 0
+            for q, truth in zip(queries, exact_top):
+                rows, _ = index.search(q, vectors, limit, nprobe=nprobe, refine=refine)
+                hits += len(truth & set(rows.tolist()))
+            elapsed = (time.perf_counter() - start) / len(queries) * 1000
+            print(f"   nprobe={nprobe:<3} refine={refine}: recall@{limit} {hits / (limit * len(queries)):.3f} | {elapsed:.3f} ms/query")
@@ -0,0 +1,167 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collections import Counter
+
+import numpy as np
+
+from data.course_resolver import fold_text
+from data.local_index import LocalScoredPoint, CourseGroups
+from data.payload_filter import PayloadMasks
+
+
+# Words every course document shares (template labels) or that carry no topic
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it',
+    'of', 'on', 'or', 'the', 'this', 'to', 'with', 'what', 'which', 'show', 'me', 'all',
+    'course', 'courses', 'credits', 'theory', 'lab', 'description', 'vietnamese', 'program',
+    'outcome', 'week', 'topic',
+}
+
+
+def tokenize(text):
+    """
+    Folded unigrams plus adjacent-word bigrams
+
+    Vietnamese words are written as separate syllables ('lap trinh'), and
+    English course names are mostly multi-word terms ('machine learning'),
+    so bigrams let phrase matches outscore documents that merely contain
+    both words somewhere.
+    """
+    words = [w for w in fold_text(text).split() if w not in STOP_WORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def document_text(payload):
+    """Indexed text of a point: the create_course_text string when stored, else rebuilt from fields"""
+    if payload.get('text'):
+        return payload['text']
+    parts = [payload.get('course_id'), payload.get('course_name'), payload.get('name_vn'),
+             payload.get('description'), payload.get('program')]
+    return ". ".join(p for p in parts if p)
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 over course documents
+
+    Postings are stored in CSR form (per-term slices of doc_ids / weights),
+    with the full BM25 term weight precomputed at build time, so a query is
+    one vectorized scatter-add per query term plus an argpartition.
+    Filters are applied to the score vector before the top-k. Chunks of
+    one course are aggregated by max, like the dense side.
+    """
+
+    def __init__(self, points, k1=1.2, b=0.75):
+        """points: {point_id: payload}"""
+        self.ids = list(points)
+        self.payloads = [points[point_id] for point_id in self.ids]
+        self.vocab = {}
+
+        term_ids, doc_ids, tfs = [], [], []
+        lengths = np.zeros(len(self.ids), dtype=np.float32)
+        for d, payload in enumerate(self.payloads):
+            counts = Counter(tokenize(document_text(payload)))
+            lengths[d] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(d)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind='stable')
+        term_ids = term_ids[order]
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        tfs = np.asarray(tfs, dtype=np.float32)[order]
+
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        self.offsets = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        n = len(self.ids)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = lengths.mean() if n else 1.0
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / max(avg_length, 1e-6))
+        self.weights = idf[term_ids] * tfs * (k1 + 1) / (tfs + norm)
+        self.masks = PayloadMasks(self.payloads)
+        self.groups = CourseGroups(self.payloads)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, query):
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            # Each document appears once per term, so plain fancy-index += is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def search(self, query, limit=10, filters=None):
+        """Top documents by BM25 score (documents sharing no term are left out)"""
+        if not self.ids:
+            return []
+        scores = self.scores(query)
+        mask = self.masks.mask(filters)
+        if mask is not None:
+            scores[~mask] = 0
+        scores[scores <= 0] = -np.inf
+        hits, best = self.groups.top(scores, limit)
+        return [LocalScoredPoint(self.ids[d], float(score), self.payloads[d]) for d, score in zip(hits, best)]
+
+
+def reciprocal_rank_fusion(result_lists, limit, k=60):
+    """
+    Merge ranked lists by sum of 1 / (k + rank)
+
+    Only ranks matter, so dense cosine scores and BM25 scores need no
+    calibration against each other. Points are matched on course_id.
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            key = (result.payload or {}).get('course_id', result.id)
+            entry = fused.get(key)
+            if entry is None:
+                fused[key] = [1 / (k + rank), result]
+            else:
+                entry[0] += 1 / (k + rank)
+
+    ranked = sorted(fused.values(), key=lambda entry: -entry[0])[:limit]
+    return [LocalScoredPoint(result.id, score, result.payload) for score, result in ranked]
+
+
+# Test
+if __name__ == "__main__":
+    import time
+    from data.vector_backend import create_vector_backend
+
+    print("=" * 60)
+    print("Testing BM25 Index...")
+    print("=" * 60)
+    print()
+
+    backend = create_vector_backend()
+    points = backend.scroll_payloads("curriculum")
+    if not points:
+        print("❌ Could not read payloads from the vector backend")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    index = BM25Index(points)
+    print(f"📊 Indexed {len(index)} documents, {len(index.vocab)} terms in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    queries = sys.argv[1:] or ["database", "lập trình", "machine learning", "data structures and algorithms"]
+    runs = 1000
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(runs):
+            results = index.search(query, 5)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"🔍 '{query}' ({elapsed * 1e6:.0f} µs)")
+        for result in results:
+            print(f"   {result.score:6.2f}  {result.payload['course_id']}: {result.payload['course_name']}")
+        print()
@@ -0,0 +1,284 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from config import Config
+
+
+COURSE_ID_PATTERN = re.compile(r'^[a-z]{2,4}\d{3,4}$')
+
+
+def fold_text(text):
+    """Lowercase, strip Vietnamese diacritics ('Lập trình' -> 'lap trinh') and punctuation"""
+    text = (text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class CourseIndex:
+    """
+    Immutable lookup structures over one read of the course table
+
+    Each course contributes up to two keys (English and Vietnamese name, both
+    folded). Tokens map to the keys containing them; tokens that aren't in
+    the vocabulary are matched to vocabulary tokens sharing trigrams, within
+    a small edit distance.
+    """
+
+    def __init__(self, courses):
+        self.courses = courses
+        self.by_id = {c['id'].upper(): i for i, c in enumerate(courses)}
+
+        self.key_course = []     # key index -> course index
+        self.key_text = []       # key index -> folded name
+        self.key_weight = []     # key index -> sum of token idf
+        self.postings = defaultdict(list)
+        for i, course in enumerate(courses):
+            for name in (course.get('name'), course.get('name_vn')):
+                text = fold_text(name)
+                if not text or (self.key_course and self.key_course[-1] == i and self.key_text[-1] == text):
+                    continue
+                k = len(self.key_text)
+                self.key_course.append(i)
+                self.key_text.append(text)
+                for token in set(text.split()):
+                    self.postings[token].append(k)
+
+        n = max(len(self.key_text), 1)
+        self.idf = {token: math.log(1 + n / len(keys)) for token, keys in self.postings.items()}
+        self.key_weight = [sum(self.idf[t] for t in set(text.split())) for text in self.key_text]
+
+        self.trigram_tokens = defaultdict(set)
+        for token in self.postings:
+            for gram in trigrams(token):
+                self.trigram_tokens[gram].add(token)
+
+        self.exact = defaultdict(list)
+        for k, text in enumerate(self.key_text):
+            self.exact[text].append(k)
+
+    def fuzzy_tokens(self, token):
+        """[(vocabulary token, similarity)] for a token not in the vocabulary"""
+        grams = trigrams(token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self.trigram_tokens.get(gram, ()):
+                shared[candidate] += 1
+
+        limit = 1 if len(token) <= 5 else 2
+        matches = []
+        for candidate, count in shared.items():
+            jaccard = count / (len(grams) + len(trigrams(candidate)) - count)
+            if jaccard < 0.3:
+                continue
+            distance = edit_distance(token, candidate, limit)
+            if distance <= limit:
+                matches.append((candidate, 1 - distance / max(len(token), len(candidate))))
+        return matches
+
+    def resolve(self, text, limit=5, min_score=0.3):
+        """Ranked [(score, course index)]; 1.0 means exact ID or exact full name"""
+        folded = fold_text(text)
+        if not folded:
+            return []
+
+        compact = folded.replace(' ', '')
+        if COURSE_ID_PATTERN.match(compact) and compact.upper() in self.by_id:
+            return [(1.0, self.by_id[compact.upper()])]
+
+        best = {}
+        for k in self.exact.get(folded, ()):
+            best[self.key_course[k]] = 1.0
+
+        query_tokens = folded.split()
+        query_weight = 0.0
+        matched = defaultdict(float)
+        for token in query_tokens:
+            if token in self.postings:
+                candidates = [(token, 1.0)]
+                query_weight += self.idf[token]
+            else:
+                candidates = self.fuzzy_tokens(token)
+                # Unknown token: count it like the rarest word so junk lowers the score
+                query_weight += max((self.idf[c] for c, _ in candidates), default=math.log(1 + len(self.key_text)))
+            # A query token counts once per key, via its best matching name token
+            token_weights = {}
+            for candidate, similarity in candidates:
+                weight = self.idf[candidate] * similarity
+                for k in self.postings[candidate]:
+                    if weight > token_weights.get(k, 0):
+                        token_weights[k] = weight
+            for k, weight in token_weights.items():
+                matched[k] += weight
+
+        for k, weight in matched.items():
+            # Mostly: how much of the query is explained; partly: how much of the name
+            score = 0.7 * min(weight / query_weight, 1.0) + 0.3 * min(weight / self.key_weight[k], 1.0)
+            score = min(score, 0.99)
+            i = self.key_course[k]
+            if score >= min_score and score > best.get(i, 0):
+                best[i] = score
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1], self.courses[item[0]]['id']))
+        return [(score, i) for i, score in ranked[:limit]]
+
+
+class CourseResolver:
+    """
+    In-memory course name / ID resolver
+
+    Replaces the LIKE '%...%' scans of MySQLConnector.find_course_by_name:
+    exact ID hash lookup, token index over English and Vietnamese names with
+    diacritic folding, and trigram + edit distance fuzzy matching. The index
+    is rebuilt by refresh(); refresh_if_changed() compares a cheap catalog
+    fingerprint at most every Config.COURSE_RESOLVER_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, mysql, check_interval=None):
+        self.mysql = mysql
+        self.check_interval = Config.COURSE_RESOLVER_CHECK_INTERVAL if check_interval is None else check_interval
+        self.index = None
+        self.fingerprint = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.index is not None
+
+    def catalog_fingerprint(self):
+        rows = self.mysql.execute_query("""
+        SELECT
+            COUNT(*) as n,
+            SUM(CRC32(CONCAT_WS('|', id, name, IFNULL(name_vn, '')))) as checksum
+        FROM course
+        """)
+        if not rows:
+            return None
+        return (rows[0]['n'], str(rows[0]['checksum']))
+
+    def refresh(self):
+        """(Re)build the index from the course table. Returns True on success."""
+        courses = self.mysql.execute_query("""
+        SELECT id, name, name_vn
+        FROM course
+        ORDER BY id
+        """)
+        if not courses:
+            return False
+
+        index = CourseIndex(courses)
+        fingerprint = self.catalog_fingerprint()
+        with self.lock:
+            self.index = index
+            self.fingerprint = fingerprint
+            self.checked_at = time.monotonic()
+        return True
+
+    def refresh_if_changed(self):
+        """Rebuild if the catalog fingerprint moved (checked at most every check_interval)"""
+        if self.index is None:
+            return self.refresh()
+        if not self.check_interval or time.monotonic() - self.checked_at < self.check_interval:
+            return False
+
+        self.checked_at = time.monotonic()
+        fingerprint = self.catalog_fingerprint()
+        if fingerprint is None or fingerprint == self.fingerprint:
+            return False
+        return self.refresh()
+
+    def resolve(self, text, limit=5, min_score=0.3):
+        """
+        Scored candidates for a course name or ID, best first
+
+        Returns [{'id', 'name', 'name_vn', 'score'}] or None if the catalog
+        couldn't be loaded (callers then fall back to SQL).
+        """
+        self.refresh_if_changed()
+        index = self.index
+        if index is None:
+            return None
+        return [
+            dict(index.courses[i], score=score)
+            for score, i in index.resolve(text, limit, min_score)
+        ]
+
+    def find_course_by_name(self, course_name, min_score=0.5):
+        """
+        Drop-in for MySQLConnector.find_course_by_name, ranked instead of arbitrary
+
+        Weak partial matches are left out so callers can fall back to
+        semantic search rather than answer about the wrong course.
+        """
+        return self.resolve(course_name, min_score=min_score)
+
+    def stats(self):
+        index = self.index
+        if index is None:
+            return {'courses': 0, 'keys': 0, 'tokens': 0}
+        return {'courses': len(index.courses), 'keys': len(index.key_text), 'tokens': len(index.postings)}
+
+
+# Test
+if __name__ == "__main__":
+    from data.mysql_connector import MySQLConnector
+
+    print("=" * 60)
+    print("Testing Course Resolver...")
+    print("=" * 60)
+    print()
+
+    db = MySQLConnector()
+    resolver = CourseResolver(db)
+
+    start = time.perf_counter()
+    resolver.refresh()
+    print(f"📊 Indexed {resolver.stats()} in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    queries = sys.argv[1:] or ["IT079", "database", "lap trinh", "lập trình hướng đối tượng", "machne lerning", "calculus"]
+    runs = 2000
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(runs):
+            candidates = resolver.resolve(query)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"🔍 '{query}' ({elapsed * 1e6:.0f} µs)")
+        for c in candidates:
+            print(f"   {c['score']:.2f}  {c['id']}: {c['name']} / {c.get('name_vn') or '-'}")
+        print()
+
+    start = time.perf_counter()
+    for _ in range(200):
+        db.find_course_by_name(queries[1])
+    print(f"⏱️  SQL LIKE lookup for comparison: {(time.perf_counter() - start) / 200 * 1e6:.0f} µs")
+
+    db.close()
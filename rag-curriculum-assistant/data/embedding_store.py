@@ -0,0 +1,264 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config import Config
+
+STORE_FORMAT_VERSION = 1
+
+# Payload columns kept on disk ('text' feeds the in-memory BM25 index)
+STORE_FIELDS = [
+    "course_id",
+    "course_name",
+    "name_vn",
+    "description",
+    "credits_theory",
+    "credits_lab",
+    "program",
+    "programs",
+    "program_keys",
+    "credits",
+    "course_level_id",
+    "chunk_type",
+    "text",
+]
+
+
+class EmbeddingStore:
+    """
+    Versioned on-disk copy of the course embeddings
+
+    Layout:
+        <root>/CURRENT                 name of the active version
+        <root>/<version>/manifest.json model, vector size, count, ...
+        <root>/<version>/embeddings.npy float32 matrix, rows L2-normalized
+        <root>/<version>/payloads.json  columnar payload table + point IDs
+
+    Readers open embeddings.npy with mmap_mode='r', so worker processes
+    share one page-cached copy and startup doesn't depend on a reindex.
+    """
+
+    def __init__(self, root=None, keep_versions=3):
+        self.root = root or Config.EMBEDDING_STORE_DIR
+        self.keep_versions = keep_versions
+
+    def current_version(self):
+        """Name of the active version, or None if nothing was saved yet"""
+        try:
+            with open(os.path.join(self.root, "CURRENT"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def version_path(self, version, filename):
+        """Path of an extra artifact (e.g. an ANN index) stored with a version"""
+        return os.path.join(self.root, version, filename)
+
+    def save(self, ids, embeddings, payloads, model_name=None, collection_name="curriculum"):
+        """Write a new version and make it current. Returns the version name."""
+        writer = self.open_writer(model_name, collection_name)
+        try:
+            writer.append(ids, embeddings, payloads)
+            return writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+
+    def open_writer(self, model_name=None, collection_name="curriculum"):
+        """StoreWriter for a new version that is filled in batches"""
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        return StoreWriter(self, version, model_name or Config.EMBEDDING_MODEL, collection_name)
+
+    def _activate(self, version):
+        # Switch readers over atomically
+        tmp_path = os.path.join(self.root, "CURRENT.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, "CURRENT"))
+        self.prune()
+
+    def load(self, version=None, mmap=True):
+        """
+        Open a stored version (the current one by default)
+
+        Returns (manifest, ids, embeddings, payloads) or None if there is no
+        usable version. Fails loudly if the stored model or vector size don't
+        match Config, since mixing embedding spaces gives silent garbage.
+        """
+        version = version or self.current_version()
+        if not version:
+            return None
+
+        version_dir = os.path.join(self.root, version)
+        try:
+            with open(os.path.join(version_dir, "manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        if manifest.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store format: {manifest.get('format_version')}")
+        if manifest["vector_size"] != Config.VECTOR_SIZE:
+            raise ValueError(
+                f"Embedding store vector size {manifest['vector_size']} != Config.VECTOR_SIZE {Config.VECTOR_SIZE}"
+            )
+        if manifest["model"] != Config.EMBEDDING_MODEL:
+            raise ValueError(
+                f"Embedding store model {manifest['model']} != Config.EMBEDDING_MODEL {Config.EMBEDDING_MODEL}"
+            )
+
+        embeddings = np.load(
+            os.path.join(version_dir, "embeddings.npy"),
+            mmap_mode="r" if mmap else None
+        )
+        with open(os.path.join(version_dir, "payloads.json"), encoding="utf-8") as f:
+            table = json.load(f)
+
+        ids = table.pop("ids")
+        fields = list(table.keys())
+        payloads = [
+            {field: table[field][row] for field in fields}
+            for row in range(len(ids))
+        ]
+
+        return manifest, ids, embeddings, payloads
+
+    def prune(self):
+        """Remove old versions, keeping the newest keep_versions"""
+        current = self.current_version()
+        versions = sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+        for name in versions[:-self.keep_versions]:
+            if name != current:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+class StoreWriter:
+    """
+    Builds one store version from batches without holding it in memory
+
+    Vectors are appended to a raw float32 spool file and each payload column
+    to its own spool of comma-separated JSON values; commit() turns them
+    into embeddings.npy (copied in blocks through a memmap) and the columnar
+    payloads.json (the column spools concatenated, no re-parsing), then
+    makes the version current. Readers never see a half-written version.
+    """
+
+    def __init__(self, store, version, model_name, collection_name):
+        self.store = store
+        self.version = version
+        self.model_name = model_name
+        self.collection_name = collection_name
+        self.count = 0
+        self.vector_size = Config.VECTOR_SIZE
+
+        self.version_dir = os.path.join(store.root, version)
+        os.makedirs(self.version_dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.version_dir, "embeddings.f32.tmp")
+        self.vectors_file = open(self.vectors_path, "wb")
+        self.columns = ["ids"] + STORE_FIELDS
+        self.column_paths = [
+            os.path.join(self.version_dir, f"payloads.{i}.tmp") for i in range(len(self.columns))
+        ]
+        self.column_files = [open(path, "w", encoding="utf-8") for path in self.column_paths]
+
+    def append(self, ids, embeddings, payloads):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if len(ids) == 0:
+            return
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(ids) or len(ids) != len(payloads):
+            raise ValueError("ids, embeddings and payloads must have the same length")
+        if embeddings.shape[1] != self.vector_size:
+            raise ValueError(f"Vector size {embeddings.shape[1]} != {self.vector_size}")
+
+        self.vectors_file.write(embeddings.tobytes())
+        columns = [[str(point_id) for point_id in ids]] + [
+            [payload.get(field) for payload in payloads] for field in STORE_FIELDS
+        ]
+        for f, values in zip(self.column_files, columns):
+            encoded = ",".join(json.dumps(value, ensure_ascii=False, separators=(",", ":")) for value in values)
+            f.write(("," if self.count else "") + encoded)
+        self.count += len(ids)
+
+    def commit(self, block_rows=65536):
+        """Finish the version, make it current and return its name"""
+        self.vectors_file.close()
+        for f in self.column_files:
+            f.close()
+
+        embeddings_path = os.path.join(self.version_dir, "embeddings.npy")
+        if self.count == 0:
+            np.save(embeddings_path, np.zeros((0, self.vector_size), dtype=np.float32))
+        else:
+            spool = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.vector_size))
+            out = np.lib.format.open_memmap(embeddings_path, mode="w+", dtype=np.float32, shape=spool.shape)
+            for start in range(0, self.count, block_rows):
+                out[start:start + block_rows] = spool[start:start + block_rows]
+            out.flush()
+            del out, spool
+        os.remove(self.vectors_path)
+
+        with open(os.path.join(self.version_dir, "payloads.json"), "w", encoding="utf-8") as f:
+            f.write("{")
+            for column, (name, path) in enumerate(zip(self.columns, self.column_paths)):
+                f.write(("," if column else "") + json.dumps(name) + ":[")
+                with open(path, encoding="utf-8") as values:
+                    shutil.copyfileobj(values, f)
+                f.write("]")
+            f.write("}")
+        for path in self.column_paths:
+            os.remove(path)
+
+        manifest = {
+            "format_version": STORE_FORMAT_VERSION,
+            "version": self.version,
+            "collection": self.collection_name,
+            "model": self.model_name,
+            "vector_size": self.vector_size,
+            "count": self.count,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(os.path.join(self.version_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        self.store._activate(self.version)
+        return self.version
+
+    def abort(self):
+        """Discard the partially written version"""
+        for f in [self.vectors_file] + self.column_files:
+            if not f.closed:
+                f.close()
+        shutil.rmtree(self.version_dir, ignore_errors=True)
+
+
+# Test
+if __name__ == "__main__":
+    import time
+
+    print("=" * 60)
+    print("Testing Embedding Store...")
+    print("=" * 60)
+    print()
+
+    store = EmbeddingStore()
+    start = time.perf_counter()
+    loaded = store.load()
+    elapsed = time.perf_counter() - start
+
+    if loaded:
+        manifest, ids, embeddings, payloads = loaded
+        print(f"📦 Version: {manifest['version']}")
+        print(f"   Model: {manifest['model']}")
+        print(f"   Points: {manifest['count']} x {manifest['vector_size']}")
+        print(f"⏱️  Open time: {elapsed * 1000:.1f} ms")
+    else:
+        print(f"ℹ️  No embedding store at {store.root}")
@@ -0,0 +1,418 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from config import Config
+from data.ann_index import IVFIndex, file_lock
+from data.payload_filter import PayloadMasks
+
+
+class LocalScoredPoint:
+    """Search hit with the same attributes the code reads from Qdrant's ScoredPoint"""
+    __slots__ = ("id", "score", "payload")
+
+    def __init__(self, id, score, payload):
+        self.id = id
+        self.score = score
+        self.payload = payload
+
+    def __repr__(self):
+        return f"LocalScoredPoint(id={self.id!r}, score={self.score:.4f})"
+
+
+class CourseGroups:
+    """
+    Rows grouped by course_id, for max-sim aggregation over chunk vectors
+
+    With multi-vector indexing a course has several rows (summary,
+    description, outcome and topic chunks). A course scores as its best
+    row: rows are kept sorted by course (CSR), so the per-course maximum is
+    one np.maximum.reduceat over the row scores. Rows without a course_id
+    count as their own course.
+    """
+
+    def __init__(self, payloads):
+        index = {}
+        self.group = np.array(
+            [index.setdefault((payload or {}).get('course_id', ('row', row)), len(index))
+             for row, payload in enumerate(payloads)],
+            dtype=np.int32
+        )
+        self.count = len(index)
+        self.single = self.count == len(self.group)
+        self.order = np.argsort(self.group, kind="stable")
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(self.group, minlength=self.count))]).astype(np.int64)
+
+    def top(self, scores, limit):
+        """(rows, scores): best row of each of the top-limit courses; -inf rows never match"""
+        if self.single:
+            candidates = np.flatnonzero(scores > -np.inf)
+            best = scores[candidates]
+        else:
+            best = np.maximum.reduceat(scores[self.order], self.offsets[:-1])
+            candidates = np.flatnonzero(best > -np.inf)
+            best = best[candidates]
+
+        k = min(limit, len(candidates))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-best, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+        top = top[np.argsort(-best[top], kind="stable")]
+        if self.single:
+            return candidates[top], best[top]
+
+        rows = []
+        for g in candidates[top]:
+            segment = self.order[self.offsets[g]:self.offsets[g + 1]]
+            rows.append(segment[np.argmax(scores[segment])])
+        return np.asarray(rows, dtype=np.int64), best[top]
+
+    def dedupe(self, rows, scores, limit):
+        """Keep the first (best) row per course of an already ranked list"""
+        if self.single:
+            return rows[:limit], scores[:limit]
+        seen = set()
+        keep = []
+        for i, row in enumerate(rows):
+            g = self.group[row]
+            if g not in seen:
+                seen.add(g)
+                keep.append(i)
+                if len(keep) == limit:
+                    break
+        return rows[keep], scores[keep]
+
+
+class LocalCollection:
+    """
+    Vectors of one collection in a contiguous float32 matrix
+
+    Rows are L2-normalized on insert, so cosine similarity is a single
+    matrix-vector product. The matrix grows by doubling; deletes move the
+    last row into the freed slot so live rows stay in [0, count).
+    
+    Large collections can attach an IVFIndex (build_ann / attach_ann); it is
+    kept in step with upserts and deletes and used by search() once the
+    collection has Config.ANN_MIN_POINTS rows.
+    
+    Filtered searches use PayloadMasks (rebuilt lazily after writes) and
+    score only the matching rows, so the filter applies before top-k.
+    Results are one hit per course: its best-scoring row (CourseGroups).
+    """
+
+    def __init__(self, vector_size, capacity=1024):
+        self.vector_size = vector_size
+        self.vectors = np.zeros((capacity, vector_size), dtype=np.float32)
+        self.ids = []
+        self.payloads = []
+        self.rows = {}
+        self.ann = None
+        self._masks = None
+        self._groups = None
+
+    @classmethod
+    def from_arrays(cls, ids, vectors, payloads):
+        """
+        Wrap existing rows without copying (vectors may be a read-only memmap)
+
+        Rows must already be L2-normalized. The first write copies the matrix
+        into process memory.
+        """
+        collection = cls(vectors.shape[1], capacity=1)
+        collection.vectors = vectors
+        collection.ids = list(ids)
+        collection.payloads = list(payloads)
+        collection.rows = {point_id: row for row, point_id in enumerate(collection.ids)}
+        return collection
+
+    @property
+    def count(self):
+        return len(self.ids)
+
+    def export(self):
+        """Return (ids, vectors, payloads) for the live rows"""
+        return list(self.ids), self.vectors[:self.count], list(self.payloads)
+
+    def _ensure_capacity(self, needed):
+        capacity = self.vectors.shape[0]
+        if not self.vectors.flags.writeable:
+            # Copy-on-write for memory-mapped stores
+            capacity = max(capacity, 1)
+            while capacity < needed:
+                capacity *= 2
+            owned = np.zeros((capacity, self.vector_size), dtype=np.float32)
+            owned[:self.count] = self.vectors[:self.count]
+            self.vectors = owned
+            return
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, self.vector_size), dtype=np.float32)
+        grown[:self.count] = self.vectors[:self.count]
+        self.vectors = grown
+
+    def upsert(self, ids, vectors, payloads):
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(-1, self.vector_size))
+        self._ensure_capacity(self.count + len(ids))
+
+        written = []
+        for point_id, vector, payload in zip(ids, vectors, payloads):
+            row = self.rows.get(point_id)
+            if row is None:
+                row = self.count
+                self.rows[point_id] = row
+                self.ids.append(point_id)
+                self.payloads.append(payload)
+            else:
+                self.payloads[row] = payload
+            self.vectors[row] = vector
+            written.append(row)
+        self._masks = self._groups = None
+
+        if self.ann is not None:
+            # Incremental insert: new rows go to their nearest cell
+            self.ann.add(written, vectors)
+
+    def delete(self, ids):
+        self._ensure_capacity(self.count)
+        for point_id in ids:
+            row = self.rows.pop(point_id, None)
+            if row is None:
+                continue
+            last = self.count - 1
+            if row != last:
+                moved_id = self.ids[last]
+                self.vectors[row] = self.vectors[last]
+                self.ids[row] = moved_id
+                self.payloads[row] = self.payloads[last]
+                self.rows[moved_id] = row
+                if self.ann is not None:
+                    self.ann.move(last, row)
+            self.ids.pop()
+            self.payloads.pop()
+            if self.ann is not None:
+                self.ann.truncate(self.count)
+        self._masks = self._groups = None
+
+    def build_ann(self, nlist=None, nprobe=None, refine=None):
+        """Train an IVF index over the current rows"""
+        self.ann = IVFIndex.train(self.vectors[:self.count], nlist, nprobe, refine)
+        return self.ann
+
+    def attach_ann(self, ann):
+        """Use a previously saved IVF index if it covers exactly these rows"""
+        if ann is None or ann.count != self.count or ann.vector_size != self.vector_size:
+            return False
+        self.ann = ann
+        return True
+
+    @property
+    def masks(self):
+        if self._masks is None:
+            self._masks = PayloadMasks(self.payloads)
+        return self._masks
+
+    @property
+    def groups(self):
+        if self._groups is None:
+            self._groups = CourseGroups(self.payloads)
+        return self._groups
+
+    def search(self, query_vector, limit, exact=False, filters=None):
+        count = self.count
+        if count == 0 or limit <= 0:
+            return []
+
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+        groups = self.groups
+
+        mask = self.masks.mask(filters)
+        if mask is not None:
+            # Score only the matching rows (filtered subsets are small enough to scan)
+            rows = np.flatnonzero(mask)
+            if len(rows) == 0:
+                return []
+            scores = np.full(count, -np.inf, dtype=np.float32)
+            scores[rows] = self.vectors[rows] @ query
+            rows, scores = groups.top(scores, limit)
+        elif self.ann is not None and not exact and count >= Config.ANN_MIN_POINTS:
+            # Over-fetch rows so enough distinct courses survive deduplication
+            per_course = int(np.ceil(count / groups.count))
+            rows, scores = self.ann.search(query, self.vectors, limit * per_course)
+            rows, scores = groups.dedupe(rows, scores, limit)
+        else:
+            rows, scores = groups.top(self.vectors[:count] @ query, limit)
+
+        return [
+            LocalScoredPoint(self.ids[row], float(score), self.payloads[row])
+            for row, score in zip(rows, scores)
+        ]
+
+
+def normalize_rows(matrix):
+    """L2-normalize each row, leaving all-zero rows untouched"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalIndexConnector:
+    """
+    In-process drop-in for QdrantConnector
+
+    Exposes the same create_collection / upsert_points / search surface so
+    search code can run without a network round trip to Qdrant Cloud.
+    """
+
+    def __init__(self, vector_size=None):
+        self.vector_size = vector_size or Config.VECTOR_SIZE
+        self.collections = {}
+        self.versions = {}
+        # Mirrors QdrantConnector.client so existing "if not x.client" checks pass
+        self.client = self
+
+    def create_collection(self, collection_name="curriculum", recreate=True):
+        """Create (or reset) an in-memory collection"""
+        if recreate or collection_name not in self.collections:
+            self.collections[collection_name] = LocalCollection(self.vector_size)
+        return True
+
+    def collection_exists(self, collection_name="curriculum"):
+        return collection_name in self.collections
+
+    def upsert_points(self, collection_name, points):
+        """Insert or replace points (anything with id, vector and payload)"""
+        if collection_name not in self.collections:
+            self.create_collection(collection_name)
+        if not points:
+            return True
+
+        self.collections[collection_name].upsert(
+            [p.id for p in points],
+            [p.vector for p in points],
+            [p.payload or {} for p in points]
+        )
+        return True
+
+    def delete_points(self, collection_name, point_ids):
+        """Delete points by ID"""
+        collection = self.collections.get(collection_name)
+        if collection is not None:
+            collection.delete(point_ids)
+        return True
+
+    def scroll_payloads(self, collection_name, fields=None, batch_size=1000):
+        """Return {point_id: payload} for every point"""
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            return None
+        if fields:
+            return {
+                point_id: {f: payload[f] for f in fields if f in payload}
+                for point_id, payload in zip(collection.ids, collection.payloads)
+            }
+        return dict(zip(collection.ids, collection.payloads))
+
+    def search(self, collection_name, query_vector, limit=5, filters=None):
+        """Top-k courses by best chunk cosine similarity, restricted to points matching filters"""
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            return []
+        return collection.search(query_vector, limit, filters=filters)
+
+    async def search_async(self, collection_name, query_vector, limit=5, filters=None):
+        """Same as search; in-process and sub-millisecond, so no thread hop"""
+        return self.search(collection_name, query_vector, limit, filters)
+
+    def get_collection_info(self, collection_name="curriculum"):
+        """Get info about collection"""
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            return None
+        return SimpleNamespace(points_count=collection.count, status="green")
+
+    def get_collection_version(self, collection_name="curriculum"):
+        """Version of the loaded embedding store (None if not loaded from one)"""
+        return self.versions.get(collection_name)
+
+    def load_from(self, source, collection_name="curriculum"):
+        """Copy a collection (vectors + payloads) from another connector, e.g. Qdrant"""
+        records = source.scroll_points(collection_name, with_vectors=True)
+        if records is None:
+            return False
+
+        self.create_collection(collection_name)
+        self.upsert_points(collection_name, records)
+        self.versions[collection_name] = source.get_collection_version(collection_name)
+        print(f"✅ Loaded {len(records)} points into local index: {collection_name}")
+        return True
+
+    def load_store(self, store, collection_name="curriculum", build_ann=True):
+        """
+        Open the current EmbeddingStore version as a collection (memory-mapped)
+
+        build_ann=False skips the ANN index, for callers that only rewrite the
+        store (the indexer) and never search it.
+        """
+        loaded = store.load(mmap=True)
+        if loaded is None:
+            return None
+
+        manifest, ids, embeddings, payloads = loaded
+        collection = LocalCollection.from_arrays(ids, embeddings, payloads)
+        self.collections[collection_name] = collection
+        self.versions[collection_name] = manifest['version']
+        print(f"✅ Opened embedding store {manifest['version']}: {manifest['count']} points")
+
+        if build_ann and Config.ANN_INDEX and collection.count >= Config.ANN_MIN_POINTS:
+            # ANN index lives next to the vectors of the same version
+            ann_path = store.version_path(manifest['version'], "ivf.npz")
+            if not collection.attach_ann(IVFIndex.load(ann_path)):
+                # One worker trains and saves, the others wait and load its file
+                with file_lock(ann_path + ".lock"):
+                    if not collection.attach_ann(IVFIndex.load(ann_path)):
+                        collection.build_ann()
+                        try:
+                            collection.ann.save(ann_path)
+                        except OSError as e:
+                            print(f"⚠️  Could not save ANN index: {e}")
+            print(f"✅ ANN index: {collection.ann.stats()}")
+        return manifest
+
+
+# Test
+if __name__ == "__main__":
+    import time
+
+    print("=" * 60)
+    print("Testing Local Vector Index...")
+    print("=" * 60)
+    print()
+
+    rng = np.random.default_rng(0)
+    n, dim = 5000, Config.VECTOR_SIZE
+    points = [
+        SimpleNamespace(id=i, vector=rng.standard_normal(dim), payload={"course_id": f"C{i:04d}"})
+        for i in range(n)
+    ]
+
+    index = LocalIndexConnector()
+    index.create_collection("test_collection")
+    index.upsert_points("test_collection", points)
+
+    query = rng.standard_normal(dim)
+    start = time.perf_counter()
+    runs = 1000
+    for _ in range(runs):
+        results = index.search("test_collection", query, limit=5)
+    elapsed = (time.perf_counter() - start) / runs
+
+    print(f"📊 Points: {index.get_collection_info('test_collection').points_count}")
+    print(f"⏱️  Search: {elapsed * 1000:.3f} ms/query")
+    for r in results:
+        print(f"   {r.payload['course_id']}: {r.score:.4f}")
@@ -3,44 +3,329 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import queue
+import threading
+import time
+
 import mysql.connector
-from mysql.connector import Error
-class Config:
-    MYSQL_HOST = "localhost"
-    MYSQL_USER = "root"
-    MYSQL_PASSWORD = "Bamboo0610@"
-    MYSQL_DATABASE = "digit_curriculum"
+from mysql.connector import Error, errors
+
+from config import Config
+
+class PoolTimeout(Error):
+    """No pooled connection became free within the checkout timeout"""
+
+class ConnectionPool:
+    """
+    Fixed-size pool of MySQL connections
+    
+    Connections are opened lazily up to pool_size. A checkout waits up to
+    checkout_timeout seconds for a free one. Connections that sat idle longer
+    than ping_interval are pinged (and reconnected) before being handed out.
+    """
+    
+    def __init__(self, pool_size=None, checkout_timeout=None, ping_interval=None):
+        self.pool_size = pool_size or Config.MYSQL_POOL_SIZE
+        self.checkout_timeout = checkout_timeout if checkout_timeout is not None else Config.MYSQL_POOL_TIMEOUT
+        self.ping_interval = ping_interval if ping_interval is not None else Config.MYSQL_PING_INTERVAL
+        
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.created = 0
+        
+        # Prepared statement cursors per connection: {id(conn): {sql: cursor}}
+        self.statements = {}
+        
+        # Metrics
+        self.in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.reconnects = 0
+        # Slots freed by broken connections; the next connection opened for one is a reconnect
+        self.dropped = 0
+    
+    def _connect(self):
+        return mysql.connector.connect(
+            host=Config.MYSQL_HOST,
+            user=Config.MYSQL_USER,
+            password=Config.MYSQL_PASSWORD,
+            database=Config.MYSQL_DATABASE
+        )
+    
+    def acquire(self):
+        """Check out a live connection (raises PoolTimeout / mysql Error)"""
+        conn = None
+        try:
+            conn, last_used = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                can_create = self.created < self.pool_size
+                if can_create:
+                    self.created += 1
+            if can_create:
+                try:
+                    conn, last_used = self._connect(), time.monotonic()
+                except Error:
+                    with self.lock:
+                        self.created -= 1
+                    raise
+                with self.lock:
+                    if self.dropped:
+                        self.dropped -= 1
+                        self.reconnects += 1
+            else:
+                start = time.monotonic()
+                with self.lock:
+                    self.waits += 1
+                try:
+                    conn, last_used = self.idle.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    with self.lock:
+                        self.timeouts += 1
+                    raise PoolTimeout(msg=f"No MySQL connection free after {self.checkout_timeout}s")
+                finally:
+                    with self.lock:
+                        self.wait_seconds += time.monotonic() - start
+        
+        if time.monotonic() - last_used > self.ping_interval:
+            conn = self._ensure_alive(conn)
+        
+        with self.lock:
+            self.in_use += 1
+            self.checkouts += 1
+        return conn
+    
+    def prepared_cursor(self, conn, sql):
+        """
+        (statement text, cached prepared cursor) for sql on this connection
+
+        The cursor only skips re-preparing when it is executed with the very
+        same str object it last ran (an identity check), so callers must
+        execute the returned text, not an equal copy of it.
+        """
+        cursors = self.statements.setdefault(id(conn), {})
+        entry = cursors.get(sql)
+        if entry is None:
+            entry = (sql, conn.cursor(prepared=True))
+            cursors[sql] = entry
+        return entry
+    
+    def drop_statement(self, conn, sql):
+        """Close and forget one cached prepared statement of a connection"""
+        entry = self.statements.get(id(conn), {}).pop(sql, None)
+        if entry is not None:
+            try:
+                entry[1].close()
+            except Exception:
+                pass
+    
+    def _forget(self, conn):
+        """Drop cached statements of a connection that is going away"""
+        for _, cursor in self.statements.pop(id(conn), {}).values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+    
+    def _ensure_alive(self, conn):
+        """Health-check ping; swap in a fresh connection if the old one died"""
+        try:
+            conn.ping(reconnect=False)
+            return conn
+        except Error:
+            return self.replace(conn)
+    
+    def replace(self, conn):
+        """Drop a broken connection and open a new one in its slot"""
+        self._forget(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        try:
+            new_conn = self._connect()
+        except Error:
+            with self.lock:
+                self.created -= 1
+            raise
+        with self.lock:
+            self.reconnects += 1
+        return new_conn
+    
+    def release(self, conn, broken=False, discard=False):
+        """Return conn to the pool; broken (dead) or discard (unusable, e.g. unread rows) closes it"""
+        with self.lock:
+            self.in_use -= 1
+        if broken or discard:
+            self._forget(conn)
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self.lock:
+                self.created -= 1
+                if broken:
+                    self.dropped += 1
+            return
+        self.idle.put((conn, time.monotonic()))
+    
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self._forget(conn)
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self.lock:
+                self.created -= 1
+    
+    def metrics(self):
+        with self.lock:
+            return {
+                'pool_size': self.pool_size,
+                'open': self.created,
+                'in_use': self.in_use,
+                'idle': self.idle.qsize(),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'avg_wait_ms': self.wait_seconds / self.waits * 1000 if self.waits else 0.0,
+                'timeouts': self.timeouts,
+                'reconnects': self.reconnects,
+            }
+
+# Errors that mean the connection itself is gone, not that the query was bad
+CONNECTION_ERRORS = (errors.OperationalError, errors.InterfaceError)
 
 class MySQLConnector:
-    def __init__(self):
+    def __init__(self, pool_size=None):
+        self.pool = ConnectionPool(pool_size=pool_size)
+        self.connected = False
+        self.last_attempt = None
+        # Open one connection up front so misconfiguration shows at startup
+        self.connect()
+    
+    def connect(self):
+        """Check out and return one connection to verify MySQL is reachable"""
+        self.last_attempt = time.monotonic()
         try:
-            self.connection = mysql.connector.connect(
-                host=Config.MYSQL_HOST,
-                user=Config.MYSQL_USER,
-                password=Config.MYSQL_PASSWORD,
-                database=Config.MYSQL_DATABASE
-            )
-            if self.connection.is_connected():
-                print("✅ Connected to MySQL")
+            conn = self.pool.acquire()
+            self.pool.release(conn)
+            print("✅ Connected to MySQL")
+            self.connected = True
         except Error as e:
             print(f"❌ MySQL Connection Error: {e}")
-            self.connection = None
+        return self.connected
     
-    def execute_query(self, query):
+    def is_connected(self):
+        """
+        Live check: while MySQL is unreachable, retry connecting (at most
+        every Config.MYSQL_RETRY_INTERVAL seconds), so a database that comes
+        up after the service is picked up without a restart
+        """
+        if self.connected:
+            return True
+        if time.monotonic() - self.last_attempt < Config.MYSQL_RETRY_INTERVAL:
+            return False
+        return self.connect()
+    
+    def execute_query(self, query, params=None):
         """Execute SELECT query and return results"""
-        if not self.connection:
+        return self._run(query, params, prepared=False)
+    
+    def execute_prepared(self, query, params=()):
+        """
+        Execute a parameterized SELECT as a server-side prepared statement
+        
+        The statement is prepared once per pooled connection and re-executed
+        with new parameters afterwards, so the server skips re-parsing.
+        """
+        return self._run(query, params, prepared=True)
+    
+    def _run(self, query, params, prepared):
+        if not self.is_connected():
             print("❌ No database connection")
             return []
         
+        # One transparent retry on a fresh connection if the old one dropped
+        for attempt in range(2):
+            try:
+                conn = self.pool.acquire()
+            except Error as e:
+                print(f"❌ MySQL Pool Error: {e}")
+                return []
+            
+            broken = False
+            try:
+                if prepared:
+                    statement, cursor = self.pool.prepared_cursor(conn, query)
+                    cursor.execute(statement, params)
+                    columns = cursor.column_names
+                    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+                
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(query, params)
+                results = cursor.fetchall()
+                cursor.close()
+                return results
+            except CONNECTION_ERRORS as e:
+                # The pool counts the reconnect when it opens the replacement
+                broken = True
+                if attempt == 0:
+                    continue
+                print(f"❌ Query Error: {e}")
+                return []
+            except Error as e:
+                if prepared:
+                    # Don't reuse a statement that just failed; closing it frees the server-side handle
+                    self.pool.drop_statement(conn, query)
+                print(f"❌ Query Error: {e}")
+                return []
+            finally:
+                self.pool.release(conn, broken=broken)
+        return []
+    
+    def stream_query(self, query, params=None, fetch_size=None):
+        """
+        Yield the rows of a SELECT one by one from an unbuffered cursor
+        
+        The server streams the result set and rows are read off the socket
+        fetch_size at a time, so memory does not grow with the result. The
+        pooled connection is held until the generator is exhausted or closed
+        and can't run other statements meanwhile, so concurrent streams each
+        check out their own connection. Errors are raised, not swallowed: a
+        silently truncated stream would look like deleted rows to the indexer.
+        """
+        if not self.is_connected():
+            raise Error(msg="No database connection")
+        
+        fetch_size = fetch_size or Config.MYSQL_FETCH_SIZE
+        conn = self.pool.acquire()
+        cursor = None
+        finished = False
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query)
-            results = cursor.fetchall()
-            cursor.close()
-            return results
-        except Error as e:
-            print(f"❌ Query Error: {e}")
-            return []
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield from rows
+            finished = True
+        finally:
+            if finished:
+                cursor.close()
+            # Unread rows would block the connection: drop it instead of returning it
+            self.pool.release(conn, discard=not finished)
+    
+    def pool_metrics(self):
+        """In-use / wait / reconnect counters for sizing the pool"""
+        return self.pool.metrics()
     
     def get_all_courses(self):
         """Get all courses with basic info"""
@@ -52,6 +337,7 @@ class MySQLConnector:
             c.description,
             c.credit_theory,
             c.credit_lab,
+            c.course_level_id,
             p.name as program_name
         FROM course c
         LEFT JOIN course_program cp ON c.id = cp.course_id
@@ -59,10 +345,63 @@ class MySQLConnector:
         """
         return self.execute_query(query)
     
-    def get_prerequisites(self, course_id):
-        """Get full prerequisites information for a course"""
-        query = f"""
-        SELECT DISTINCT
+    def get_program_names(self):
+        """Names of all programs (used to recognise program filters in questions)"""
+        rows = self.execute_query("SELECT name FROM program WHERE name IS NOT NULL")
+        return [row['name'] for row in rows or []]
+    
+    # Streams for the indexer. All are ordered by the binary course ID, so
+    # they can be merged per course in one pass (Python compares str by code
+    # point, which matches the byte order of utf8 IDs).
+    
+    def stream_courses(self):
+        """get_all_courses rows, ordered by course (one row per course/program pair)"""
+        query = """
+        SELECT 
+            c.id,
+            c.name,
+            c.name_vn,
+            c.description,
+            c.credit_theory,
+            c.credit_lab,
+            c.course_level_id,
+            p.name as program_name
+        FROM course c
+        LEFT JOIN course_program cp ON c.id = cp.course_id
+        LEFT JOIN program p ON cp.program_id = p.id
+        ORDER BY CAST(c.id AS BINARY), p.name
+        """
+        return self.stream_query(query)
+    
+    def stream_learning_outcomes(self):
+        """Learning outcomes (English and Vietnamese), ordered by course"""
+        query = """
+        SELECT 
+            lo.course_id,
+            lo.id,
+            lo.description,
+            lo.description_vn
+        FROM learning_outcome lo
+        ORDER BY CAST(lo.course_id AS BINARY), lo.id
+        """
+        return self.stream_query(query)
+    
+    def stream_topic_details(self):
+        """Weekly topic details with their topic name, ordered by course and week"""
+        query = """
+        SELECT 
+            t.course_id,
+            t.id as topic_id,
+            t.name as topic_name,
+            td.week,
+            td.topic_detail
+        FROM topic t
+        JOIN topic_detail td ON td.topic_id = t.id
+        ORDER BY CAST(t.course_id AS BINARY), td.week, t.id, td.id
+        """
+        return self.stream_query(query)
+    
+    PREREQUISITES_COLUMNS = """
             c.id,
             c.name,
             c.name_vn,
@@ -71,46 +410,112 @@ class MySQLConnector:
             c.credit_lab,
             c.credit_theory + c.credit_lab as total_credits,
             c.course_level_id,
-            ccr.relationship_id
+            ccr.relationship_id"""
+    
+    DEPENDENTS_COLUMNS = """
+            c.id,
+            c.name,
+            c.name_vn,
+            c.credit_theory + c.credit_lab as total_credits"""
+    
+    # Statement texts are built once: a prepared cursor only skips re-preparing
+    # when it is executed with the same str object again
+    PREREQUISITES_QUERY = f"""
+        SELECT DISTINCT{PREREQUISITES_COLUMNS}
         FROM course_course_relationship ccr
         JOIN course c ON ccr.course_id2 = c.id
-        WHERE ccr.course_id1 = '{course_id}'
+        WHERE ccr.course_id1 = %s
         ORDER BY c.id
         """
-        return self.execute_query(query)
-
-    def get_dependent_courses(self, course_id):
-        """Get courses that require this course as prerequisite"""
-        query = f"""
-        SELECT DISTINCT
-            c.id,
-            c.name,
-            c.name_vn,
-            c.credit_theory + c.credit_lab as total_credits
+    
+    DEPENDENTS_QUERY = f"""
+        SELECT DISTINCT{DEPENDENTS_COLUMNS}
         FROM course_course_relationship ccr
         JOIN course c ON ccr.course_id1 = c.id
-        WHERE ccr.course_id2 = '{course_id}'
+        WHERE ccr.course_id2 = %s
         ORDER BY c.id
         """
-        return self.execute_query(query)
+    
+    PREREQUISITES_BATCH_TEMPLATE = f"""
+        SELECT DISTINCT
+            ccr.course_id1 as for_course,{PREREQUISITES_COLUMNS}
+        FROM course_course_relationship ccr
+        JOIN course c ON ccr.course_id2 = c.id
+        WHERE ccr.course_id1 IN ({{placeholders}})
+        ORDER BY ccr.course_id1, c.id
+        """
+    
+    DEPENDENTS_BATCH_TEMPLATE = f"""
+        SELECT DISTINCT
+            ccr.course_id2 as for_course,{DEPENDENTS_COLUMNS}
+        FROM course_course_relationship ccr
+        JOIN course c ON ccr.course_id1 = c.id
+        WHERE ccr.course_id2 IN ({{placeholders}})
+        ORDER BY ccr.course_id2, c.id
+        """
+    
+    # {(template, padded IN-list size): statement text}, filled once per size
+    batch_statements = {}
+    
+    def get_prerequisites(self, course_id):
+        """Get full prerequisites information for a course"""
+        return self.execute_prepared(self.PREREQUISITES_QUERY, (course_id,))
+
+    def get_dependent_courses(self, course_id):
+        """Get courses that require this course as prerequisite"""
+        return self.execute_prepared(self.DEPENDENTS_QUERY, (course_id,))
+
+    def get_prerequisites_batch(self, course_ids):
+        """Prerequisites for many courses in one round trip: {course_id: [rows]}"""
+        return self._batch_lookup(course_ids, self.PREREQUISITES_BATCH_TEMPLATE)
+
+    def get_dependent_courses_batch(self, course_ids):
+        """Dependent courses for many courses in one round trip: {course_id: [rows]}"""
+        return self._batch_lookup(course_ids, self.DEPENDENTS_BATCH_TEMPLATE)
+
+    def _batch_lookup(self, course_ids, query_template):
+        course_ids = list(dict.fromkeys(course_ids))
+        grouped = {course_id: [] for course_id in course_ids}
+        if not course_ids:
+            return grouped
+        
+        # Pad the IN list to a power of two (repeating the first ID) so only a
+        # handful of distinct statements ever get prepared per connection
+        size = 1
+        while size < len(course_ids):
+            size *= 2
+        params = course_ids + [course_ids[0]] * (size - len(course_ids))
+        query = self.batch_statements.get((query_template, size))
+        if query is None:
+            query = self.batch_statements.setdefault(
+                (query_template, size),
+                query_template.format(placeholders=", ".join(["%s"] * size))
+            )
+        
+        for row in self.execute_prepared(query, tuple(params)):
+            course_id = row.pop('for_course')
+            if course_id in grouped:
+                grouped[course_id].append(row)
+        return grouped
 
     def find_course_by_name(self, course_name):
         """Find course ID by partial name match"""
-        query = f"""
+        query = """
         SELECT id, name, name_vn
         FROM course
         WHERE 
-            name LIKE '%{course_name}%'
-            OR name_vn LIKE '%{course_name}%'
-            OR id LIKE '%{course_name}%'
+            name LIKE %s
+            OR name_vn LIKE %s
+            OR id LIKE %s
         LIMIT 5
         """
-        return self.execute_query(query)
+        pattern = f"%{course_name}%"
+        return self.execute_prepared(query, (pattern, pattern, pattern))
     
     def close(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        """Close all pooled connections"""
+        if self.connected:
+            self.pool.close_all()
             print("✅ MySQL connection closed")
 
 # Test
@@ -119,7 +524,7 @@ if __name__ == "__main__":
     
     db = MySQLConnector()
     
-    if db.connection:
+    if db.is_connected():
         courses = db.get_all_courses()
         print(f"📊 Total courses: {len(courses)}")
         
@@ -128,6 +533,38 @@ if __name__ == "__main__":
             print(f"   ID: {courses[0]['id']}")
             print(f"   Name: {courses[0]['name']}")
         
+        # Benchmark: plain text query vs cached prepared statement
+        import time
+        course_id = courses[0]['id']
+        runs = 200
+        
+        start = time.perf_counter()
+        for _ in range(runs):
+            db.execute_query(f"""
+            SELECT DISTINCT{db.PREREQUISITES_COLUMNS}
+            FROM course_course_relationship ccr
+            JOIN course c ON ccr.course_id2 = c.id
+            WHERE ccr.course_id1 = '{course_id}'
+            ORDER BY c.id
+            """)
+        text_ms = (time.perf_counter() - start) / runs * 1000
+        
+        start = time.perf_counter()
+        for _ in range(runs):
+            db.get_prerequisites(course_id)
+        prepared_ms = (time.perf_counter() - start) / runs * 1000
+        
+        ids = [c['id'] for c in courses[:50]]
+        start = time.perf_counter()
+        db.get_prerequisites_batch(ids)
+        batch_ms = (time.perf_counter() - start) * 1000
+        
+        print(f"\n⏱️  Prerequisite lookup ({runs} runs):")
+        print(f"   Text query:     {text_ms:.3f} ms/query")
+        print(f"   Prepared:       {prepared_ms:.3f} ms/query")
+        print(f"   Batch of {len(ids)}:    {batch_ms:.3f} ms total")
+        
+        print(f"\n📊 Pool: {db.pool_metrics()}")
         db.close()
     else:
         print("❌ Failed to connect to database")
\ No newline at end of file
@@ -0,0 +1,102 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+
+# Structured filters accepted by the search backends: {field: value}
+#   program          one of the course's programs, any case ('program_keys' payload list)
+#   credits          theory + lab credits
+#   course_level_id  course.course_level_id
+FILTER_FIELDS = ('program', 'credits', 'course_level_id')
+
+# Payload key each filter field is matched against (Qdrant payload indexes)
+PAYLOAD_KEYS = {
+    'program': 'program_keys',
+    'credits': 'credits',
+    'course_level_id': 'course_level_id',
+}
+
+
+def clean_filters(filters):
+    """Known fields with a value, or None when nothing is left to filter on"""
+    if not filters:
+        return None
+    cleaned = {field: value for field, value in filters.items() if field in FILTER_FIELDS and value is not None}
+    return cleaned or None
+
+
+def filter_values(payload, field):
+    """Values a payload matches for a filter field (points indexed before the field existed are derived)"""
+    if field == 'program':
+        programs = payload.get('program_keys')
+        if programs is None:
+            programs = payload.get('programs')
+        if programs is None and payload.get('program'):
+            programs = [p.strip() for p in payload['program'].split(',')]
+        return programs or []
+    if field == 'credits':
+        credits = payload.get('credits')
+        if credits is None:
+            credits = (payload.get('credits_theory') or 0) + (payload.get('credits_lab') or 0)
+        return [credits]
+    value = payload.get(field)
+    return [] if value is None else [value]
+
+
+def normalize_value(field, value):
+    """
+    Canonical form of a filter value, used both when indexing and filtering
+
+    Program names are stripped and lowercased, so matching is
+    case-insensitive on every backend (Qdrant matches keywords exactly).
+    """
+    if field == 'program':
+        return str(value).strip().lower()
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class PayloadMasks:
+    """
+    Precomputed row bitmasks for the filter fields
+
+    One boolean array per (field, value), built in one pass over the
+    payloads, so a filtered search ANDs a few arrays and scores only the
+    matching rows instead of over-fetching and dropping hits after top-k.
+    Program names match case-insensitively.
+    """
+
+    def __init__(self, payloads):
+        self.count = len(payloads)
+        rows = {field: {} for field in FILTER_FIELDS}
+        for row, payload in enumerate(payloads):
+            for field in FILTER_FIELDS:
+                for value in filter_values(payload or {}, field):
+                    rows[field].setdefault(normalize_value(field, value), []).append(row)
+
+        self.masks = {}
+        for field, values in rows.items():
+            for value, matching in values.items():
+                mask = np.zeros(self.count, dtype=bool)
+                mask[matching] = True
+                self.masks[(field, value)] = mask
+
+    def mask(self, filters):
+        """Rows matching every filter, or None for no filtering"""
+        filters = clean_filters(filters)
+        if filters is None:
+            return None
+        combined = np.ones(self.count, dtype=bool)
+        for field, value in filters.items():
+            mask = self.masks.get((field, normalize_value(field, value)))
+            if mask is None:
+                return np.zeros(self.count, dtype=bool)
+            combined &= mask
+        return combined
+
+    def values(self, field):
+        return sorted(value for f, value in self.masks if f == field)
@@ -0,0 +1,495 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+from array import array
+from collections import defaultdict
+
+from mysql.connector import Error
+
+from config import Config
+
+
+class GraphSnapshot:
+    """
+    Immutable adjacency data built from one read of course_course_relationship
+
+    Courses are numbered 0..n-1. Each direction is stored in CSR form:
+    neighbours of course i are targets[offsets[i]:offsets[i+1]], with the
+    relationship_id of each edge in the parallel relationships array.
+    forward = course_id1 -> course_id2 ("needs"), reverse = "needed by".
+
+    Lookups walk every relationship type, like the SQL queries. The closure
+    and planner only follow edges whose relationship_id is in
+    prerequisite_ids (None = all), so co-requisites and other relationship
+    types neither block courses nor form false cycles.
+    """
+
+    def __init__(self, courses, edges, prerequisite_ids=None):
+        self.course_ids = [c['id'] for c in courses]
+        self.index = {course_id: i for i, course_id in enumerate(self.course_ids)}
+        self.courses = courses
+
+        forward = defaultdict(set)
+        reverse = defaultdict(set)
+        for source, target, relationship_id in edges:
+            i = self.index.get(source)
+            j = self.index.get(target)
+            if i is None or j is None:
+                # Same as the SQL JOIN: edges to unknown courses are dropped
+                continue
+            forward[i].add((j, relationship_id))
+            reverse[j].add((i, relationship_id))
+
+        self.forward = self._build_csr(forward)
+        self.reverse = self._build_csr(reverse)
+        self.edge_count = len(self.forward[1])
+
+        if prerequisite_ids is None:
+            self.prereq_forward, self.prereq_reverse = self.forward, self.reverse
+        else:
+            prerequisite_ids = set(prerequisite_ids)
+            self.prereq_forward = self._build_csr(self._only(forward, prerequisite_ids))
+            self.prereq_reverse = self._build_csr(self._only(reverse, prerequisite_ids))
+
+        self._closure = None
+        self._cycles = None
+        self._cycle_bits = 0
+
+    @staticmethod
+    def _only(adjacency, relationship_ids):
+        return {
+            i: {(j, relationship_id) for j, relationship_id in edges if relationship_id in relationship_ids}
+            for i, edges in adjacency.items()
+        }
+
+    def _build_csr(self, adjacency):
+        offsets = array('i', [0])
+        targets = array('i')
+        relationships = array('i')
+        for i in range(len(self.course_ids)):
+            for j, relationship_id in sorted(adjacency.get(i, ()), key=lambda e: (self.course_ids[e[0]], e[1] or 0)):
+                targets.append(j)
+                relationships.append(relationship_id or 0)
+            offsets.append(len(targets))
+        return offsets, targets, relationships
+
+    def neighbours(self, adjacency, i, relationship_ids=None):
+        offsets, targets, relationships = adjacency
+        for e in range(offsets[i], offsets[i + 1]):
+            if relationship_ids is None or relationships[e] in relationship_ids:
+                yield targets[e], relationships[e]
+
+    def walk(self, adjacency, course_id, max_depth=1, relationship_ids=None):
+        """
+        Breadth-first walk from course_id
+
+        Returns [(course index, depth, relationship_id)] in BFS order, each
+        course once at its shortest depth. max_depth=None walks the full
+        transitive closure.
+        """
+        start = self.index.get(course_id)
+        if start is None:
+            return []
+
+        seen = {start}
+        frontier = [start]
+        found = []
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for i in frontier:
+                for j, relationship_id in self.neighbours(adjacency, i, relationship_ids):
+                    if j in seen:
+                        continue
+                    seen.add(j)
+                    found.append((j, depth, relationship_id))
+                    next_frontier.append(j)
+            frontier = next_frontier
+        return found
+
+
+    def _ensure_closure(self):
+        """
+        Transitive prerequisite closure as one int bitset per course
+
+        Bit j of closure[i] is set when course j is a (direct or indirect)
+        prerequisite of course i. Computed in topological order so each
+        course ORs together its direct prerequisites' bitsets once. Courses
+        on or behind a prerequisite cycle can't be ordered; they get their
+        closure from a plain BFS and are reported by cycles().
+        """
+        if self._closure is not None:
+            return
+
+        n = len(self.course_ids)
+        offsets, targets, _ = self.prereq_forward
+
+        # Kahn's algorithm on "prerequisite before course"
+        remaining = [offsets[i + 1] - offsets[i] for i in range(n)]
+        ready = [i for i in range(n) if remaining[i] == 0]
+        closure = [0] * n
+        done = [False] * n
+
+        rev_offsets, rev_targets, _ = self.prereq_reverse
+        while ready:
+            i = ready.pop()
+            done[i] = True
+            bits = 0
+            for e in range(offsets[i], offsets[i + 1]):
+                j = targets[e]
+                bits |= closure[j] | (1 << j)
+            closure[i] = bits
+
+            for e in range(rev_offsets[i], rev_offsets[i + 1]):
+                k = rev_targets[e]
+                remaining[k] -= 1
+                if remaining[k] == 0:
+                    ready.append(k)
+
+        blocked = [i for i in range(n) if not done[i]]
+        for i in blocked:
+            bits = 0
+            for j, _, _ in self.walk(self.prereq_forward, self.course_ids[i], max_depth=None):
+                bits |= 1 << j
+            closure[i] = bits
+
+        self._closure = closure
+        # A blocked course is on a cycle if one of its prerequisites (transitively) requires it
+        self._cycles = [
+            self.course_ids[i] for i in blocked
+            if any(targets[e] == i or closure[targets[e]] >> i & 1 for e in range(offsets[i], offsets[i + 1]))
+        ]
+        self._cycle_bits = 0
+        for course_id in self._cycles:
+            self._cycle_bits |= 1 << self.index[course_id]
+
+    def closure(self, i):
+        self._ensure_closure()
+        return self._closure[i]
+
+    def cycles(self):
+        """Course IDs that sit on a prerequisite cycle"""
+        self._ensure_closure()
+        return list(self._cycles)
+
+    def credits(self, i):
+        course = self.courses[i]
+        return (course.get('credit_theory') or 0) + (course.get('credit_lab') or 0)
+
+    def plan(self, targets, completed=(), max_credits=None):
+        """
+        Topological semester plan for reaching the target courses
+
+        Needed courses are the targets plus their transitive prerequisites,
+        minus what is already completed (a completed course implies its own
+        prerequisites were satisfied). Each semester takes courses whose
+        prerequisites are all completed or planned earlier, longest remaining
+        chain first, up to max_credits. Courses on a cycle can't be placed and
+        are returned separately.
+        """
+        self._ensure_closure()
+        n = len(self.course_ids)
+
+        unknown = [c for c in targets if c not in self.index]
+        done_bits = 0
+        for course_id in completed:
+            i = self.index.get(course_id)
+            if i is not None:
+                done_bits |= self._closure[i] | (1 << i)
+
+        needed_bits = 0
+        for course_id in targets:
+            i = self.index.get(course_id)
+            if i is not None:
+                needed_bits |= self._closure[i] | (1 << i)
+        needed_bits &= ~done_bits
+
+        # Courses on a cycle, or needing one that isn't completed, can't be ordered
+        blocked_bits = self._cycle_bits & needed_bits
+        needed = []
+        blocked = []
+        for i in range(n):
+            if needed_bits >> i & 1:
+                if (self._closure[i] | (1 << i)) & blocked_bits:
+                    blocked.append(self.course_ids[i])
+                else:
+                    needed.append(i)
+
+        offsets, prereq_targets, _ = self.prereq_forward
+        rev_offsets, rev_targets, _ = self.prereq_reverse
+        needed_set = set(needed)
+
+        # Length of the longest chain of needed dependents behind each course;
+        # dependents have strictly larger closures, so they are computed first
+        chain = {}
+        for i in sorted(needed, key=lambda i: -bin(self._closure[i] & needed_bits).count("1")):
+            longest = 0
+            for e in range(rev_offsets[i], rev_offsets[i + 1]):
+                k = rev_targets[e]
+                if k in needed_set:
+                    longest = max(longest, chain[k] + 1)
+            chain[i] = longest
+
+        pending = {
+            i: sum(1 for e in range(offsets[i], offsets[i + 1]) if prereq_targets[e] in needed_set)
+            for i in needed
+        }
+        available = [i for i in needed if pending[i] == 0]
+        semesters = []
+
+        while available:
+            available.sort(key=lambda i: (-chain[i], self.course_ids[i]))
+            semester = []
+            credits = 0
+            deferred = []
+            for i in available:
+                course_credits = self.credits(i)
+                if max_credits and semester and credits + course_credits > max_credits:
+                    deferred.append(i)
+                    continue
+                semester.append(i)
+                credits += course_credits
+
+            # Courses unlocked by this semester become available next semester
+            unlocked = []
+            for i in semester:
+                for e in range(rev_offsets[i], rev_offsets[i + 1]):
+                    k = rev_targets[e]
+                    if k in pending:
+                        pending[k] -= 1
+                        if pending[k] == 0:
+                            unlocked.append(k)
+
+            semesters.append(semester)
+            available = deferred + unlocked
+
+        return {
+            'semesters': [[self.courses[i] for i in semester] for semester in semesters],
+            'blocked': blocked,
+            'unknown': unknown,
+        }
+
+
+class PrerequisiteGraph:
+    """
+    In-memory prerequisite graph over course_course_relationship
+
+    Loads the relationship table and course rows once, then answers direct
+    and transitive prerequisite / dependent lookups without touching MySQL.
+    Returned rows have the same fields as MySQLConnector.get_prerequisites
+    plus 'depth'. Call refresh() after the curriculum data changes.
+
+    Only prerequisite_relationship_ids (default
+    Config.PREREQUISITE_RELATIONSHIP_IDS) feed the closure and planner. When
+    none are configured they are looked up in course_relationship by name.
+    """
+
+    PREREQUISITE_NAMES = ('prerequisite', 'prereq', 'tiên quyết', 'tien quyet')
+
+    def __init__(self, mysql, prerequisite_relationship_ids=None):
+        self.mysql = mysql
+        self.prerequisite_relationship_ids = prerequisite_relationship_ids or Config.PREREQUISITE_RELATIONSHIP_IDS or None
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.snapshot is not None
+
+    def refresh(self):
+        """(Re)load courses and relationships from MySQL. Returns True on success."""
+        courses = self.mysql.execute_query("""
+        SELECT
+            c.id,
+            c.name,
+            c.name_vn,
+            c.description,
+            c.credit_theory,
+            c.credit_lab,
+            c.credit_theory + c.credit_lab as total_credits,
+            c.course_level_id
+        FROM course c
+        ORDER BY c.id
+        """)
+        if not courses:
+            return False
+
+        # execute_query returns [] on error, which would look like a graph
+        # with no prerequisites at all; the stream raises instead
+        try:
+            edges = [
+                (e['course_id1'], e['course_id2'], e['relationship_id'])
+                for e in self.mysql.stream_query("""
+                SELECT course_id1, course_id2, relationship_id
+                FROM course_course_relationship
+                """)
+            ]
+        except Error as e:
+            print(f"❌ Prerequisite graph: failed to load relationships, keeping previous snapshot: {e}")
+            return False
+
+        prerequisite_ids = self.prerequisite_relationship_ids
+        if prerequisite_ids is None:
+            try:
+                prerequisite_ids = self.load_prerequisite_ids()
+            except Error as e:
+                print(f"❌ Prerequisite graph: failed to load relationship types, keeping previous snapshot: {e}")
+                return False
+
+        snapshot = GraphSnapshot(courses, edges, prerequisite_ids)
+        # Readers keep using the old snapshot until this single assignment
+        with self.lock:
+            self.snapshot = snapshot
+        return True
+
+    def load_prerequisite_ids(self):
+        """
+        course_relationship IDs whose name marks a prerequisite
+
+        Raises mysql Error if the table can't be read. If no name matches,
+        returns None: every relationship counts, as before types were read.
+        """
+        rows = list(self.mysql.stream_query("SELECT id, relationship FROM course_relationship"))
+        ids = [
+            row['id'] for row in rows
+            if any(name in (row['relationship'] or '').lower() for name in self.PREREQUISITE_NAMES)
+        ]
+        if not ids:
+            print(f"⚠️  No prerequisite type among {[row['relationship'] for row in rows]}; "
+                  f"planning over all relationships (set PREREQUISITE_RELATIONSHIP_IDS)")
+            return None
+        return ids
+
+    def ensure_loaded(self):
+        if self.snapshot is None:
+            return self.refresh()
+        return True
+
+    def _rows(self, snapshot, found):
+        rows = []
+        for i, depth, relationship_id in found:
+            row = dict(snapshot.courses[i])
+            row['relationship_id'] = relationship_id
+            row['depth'] = depth
+            rows.append(row)
+        return rows
+
+    def get_course(self, course_id):
+        """Course row by ID from the in-memory catalog (None if unknown)"""
+        if not self.ensure_loaded():
+            return None
+        snapshot = self.snapshot
+        i = snapshot.index.get(course_id)
+        return dict(snapshot.courses[i]) if i is not None else None
+
+    def get_prerequisites(self, course_id, max_depth=1, relationship_ids=None):
+        """Courses course_id needs (max_depth=None for all transitive prerequisites)"""
+        if not self.ensure_loaded():
+            return None
+        snapshot = self.snapshot
+        return self._rows(snapshot, snapshot.walk(snapshot.forward, course_id, max_depth, relationship_ids))
+
+    def get_dependent_courses(self, course_id, max_depth=1, relationship_ids=None):
+        """Courses that need course_id (max_depth=None for all transitive dependents)"""
+        if not self.ensure_loaded():
+            return None
+        snapshot = self.snapshot
+        return self._rows(snapshot, snapshot.walk(snapshot.reverse, course_id, max_depth, relationship_ids))
+
+    def plan_study(self, targets, completed=(), max_credits=None):
+        """
+        Semester-by-semester plan to reach targets given completed courses
+
+        Returns {'semesters': [[course rows]], 'blocked': [ids on/behind a
+        cycle], 'unknown': [target ids not in the catalog]} or None if the
+        graph couldn't be loaded.
+        """
+        if not self.ensure_loaded():
+            return None
+        if max_credits is None:
+            max_credits = Config.MAX_CREDITS_PER_SEMESTER
+        return self.snapshot.plan(targets, completed, max_credits)
+
+    def find_cycles(self):
+        """Course IDs on a prerequisite cycle (bad relationship data)"""
+        if not self.ensure_loaded():
+            return None
+        return self.snapshot.cycles()
+
+    def stats(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            return {'courses': 0, 'edges': 0}
+        return {'courses': len(snapshot.course_ids), 'edges': snapshot.edge_count}
+
+
+# Test
+if __name__ == "__main__":
+    import time
+    from data.mysql_connector import MySQLConnector
+
+    print("=" * 60)
+    print("Testing Prerequisite Graph...")
+    print("=" * 60)
+    print()
+
+    # Completed courses cover their own prerequisites: chain E -> D -> C -> B -> A
+    chain = GraphSnapshot(
+        [{'id': c, 'credit_theory': 3, 'credit_lab': 0} for c in "ABCDE"],
+        [("B", "A", 1), ("C", "B", 1), ("D", "C", 1), ("E", "D", 1)]
+    )
+    chain_plan = [[c['id'] for c in semester] for semester in chain.plan(["E"], completed=["C"])['semesters']]
+    assert chain_plan == [["D"], ["E"]], chain_plan
+    print(f"✅ Plan for E with C completed: {chain_plan}\n")
+
+    # Co-requisites (relationship 2) both ways are not a prerequisite cycle
+    coreq = GraphSnapshot(
+        [{'id': c, 'credit_theory': 3, 'credit_lab': 0} for c in "ABC"],
+        [("B", "A", 1), ("B", "C", 2), ("C", "B", 2)],
+        prerequisite_ids=[1]
+    )
+    assert coreq.cycles() == [], coreq.cycles()
+    coreq_plan = [[c['id'] for c in semester] for semester in coreq.plan(["B", "C"])['semesters']]
+    assert coreq_plan == [["A", "C"], ["B"]], coreq_plan
+    print(f"✅ Plan with co-requisites ignored: {coreq_plan}\n")
+
+    db = MySQLConnector()
+    graph = PrerequisiteGraph(db)
+
+    start = time.perf_counter()
+    graph.refresh()
+    print(f"📊 Loaded {graph.stats()} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    course_id = sys.argv[1] if len(sys.argv) > 1 else "IT079"
+    runs = 10000
+    start = time.perf_counter()
+    for _ in range(runs):
+        graph.get_prerequisites(course_id)
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"⏱️  Direct prerequisites: {elapsed * 1e6:.1f} µs/query")
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        rows = graph.get_prerequisites(course_id, max_depth=None)
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"⏱️  Transitive prerequisites: {elapsed * 1e6:.1f} µs/query")
+
+    for row in rows:
+        print(f"   {'  ' * (row['depth'] - 1)}{row['id']}: {row['name']}")
+
+    start = time.perf_counter()
+    cycles = graph.find_cycles()
+    print(f"\n⏱️  Transitive closure: {(time.perf_counter() - start) * 1000:.1f} ms")
+    if cycles:
+        print(f"⚠️  Courses on prerequisite cycles: {cycles}")
+
+    start = time.perf_counter()
+    plan = graph.plan_study([course_id])
+    print(f"⏱️  Study plan: {(time.perf_counter() - start) * 1000:.2f} ms")
+    for n, semester in enumerate(plan['semesters'], 1):
+        print(f"   Semester {n}: {', '.join(c['id'] for c in semester)}")
+
+    db.close()
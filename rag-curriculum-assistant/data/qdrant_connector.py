@@ -8,30 +8,20 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-# Debug: Print what we're importing
-print(f"📂 Current dir: {current_dir}")
-print(f"📂 Parent dir: {parent_dir}")
-print(f"📂 sys.path[0]: {sys.path[0]}")
+import time
+import uuid
 
-# Import with reload to avoid cache
-import importlib
-import config
-importlib.reload(config)
 from config import Config
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, PointIdsList,
+    Filter, FieldCondition, MatchValue, PayloadSchemaType
+)
+from data.payload_filter import PAYLOAD_KEYS, clean_filters, normalize_value
 
-# Debug: Print config values
-print(f"\n🔍 Debug Config:")
-print(f"   QDRANT_URL exists: {hasattr(Config, 'QDRANT_URL')}")
-if hasattr(Config, 'QDRANT_URL'):
-    url = Config.QDRANT_URL
-    print(f"   QDRANT_URL: {url[:50] if url else 'None'}...")
-print(f"   QDRANT_API_KEY exists: {hasattr(Config, 'QDRANT_API_KEY')}")
-if hasattr(Config, 'QDRANT_API_KEY'):
-    print(f"   QDRANT_API_KEY: {'Set' if Config.QDRANT_API_KEY else 'Not Set'}")
-print()
-
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+# Small side collection holding one version point per indexed collection
+META_COLLECTION = "index_meta"
+META_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "curriculum-assistant/index-meta")
 
 class QdrantConnector:
     def __init__(self):
@@ -45,13 +35,24 @@ class QdrantConnector:
         except Exception as e:
             print(f"❌ Qdrant Connection Error: {e}")
             self.client = None
+        self.async_client = None
+        # {collection_name: (version, fetched_at)}
+        self.version_cache = {}
     
-    def create_collection(self, collection_name="curriculum"):
-        """Create collection for storing embeddings"""
+    def create_collection(self, collection_name="curriculum", recreate=True):
+        """Create collection for storing embeddings
+        
+        With recreate=False an existing collection is kept as-is, which is
+        what incremental reindexing needs.
+        """
         if not self.client:
             return False
         
         try:
+            if not recreate and self.collection_exists(collection_name):
+                print(f"ℹ️  Keeping existing collection: {collection_name}")
+                return True
+            
             # Delete if exists
             try:
                 self.client.delete_collection(collection_name)
@@ -68,11 +69,51 @@ class QdrantConnector:
                 )
             )
             print(f"✅ Created collection: {collection_name}")
+            self.create_payload_indexes(collection_name)
             return True
         except Exception as e:
             print(f"❌ Error creating collection: {e}")
             return False
     
+    def create_payload_indexes(self, collection_name="curriculum"):
+        """Index the filterable payload fields, so filtered searches don't scan payloads"""
+        schemas = {
+            'course_id': PayloadSchemaType.KEYWORD,
+            'program_keys': PayloadSchemaType.KEYWORD,
+            'credits': PayloadSchemaType.INTEGER,
+            'course_level_id': PayloadSchemaType.INTEGER,
+        }
+        for field, schema in schemas.items():
+            try:
+                self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field,
+                    field_schema=schema
+                )
+            except Exception as e:
+                print(f"⚠️  Could not index payload field {field}: {e}")
+    
+    def build_filter(self, filters):
+        """Qdrant Filter for {field: value} filters (None when there are none)"""
+        filters = clean_filters(filters)
+        if filters is None:
+            return None
+        return Filter(must=[
+            FieldCondition(key=PAYLOAD_KEYS[field], match=MatchValue(value=normalize_value(field, value)))
+            for field, value in filters.items()
+        ])
+    
+    def collection_exists(self, collection_name="curriculum"):
+        """Check whether a collection exists"""
+        if not self.client:
+            return False
+        
+        try:
+            self.client.get_collection(collection_name)
+            return True
+        except Exception:
+            return False
+    
     def upsert_points(self, collection_name, points):
         """Upload points to Qdrant"""
         if not self.client:
@@ -88,33 +129,178 @@ class QdrantConnector:
             print(f"❌ Upload Error: {e}")
             return False
     
-    def search(self, collection_name, query_vector, limit=5):
-        """Search for similar vectors"""
+    def delete_points(self, collection_name, point_ids):
+        """Delete points by ID"""
         if not self.client:
-            return []
+            return False
+        if not point_ids:
+            return True
+        
+        try:
+            self.client.delete(
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=list(point_ids))
+            )
+            return True
+        except Exception as e:
+            print(f"❌ Delete Error: {e}")
+            return False
     
+    def scroll_points(self, collection_name, fields=None, with_vectors=False, batch_size=1000):
+        """Return every point record in a collection (None on error)"""
+        if not self.client:
+            return None
+        
+        points = []
+        offset = None
+        try:
+            while True:
+                records, offset = self.client.scroll(
+                    collection_name=collection_name,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=fields if fields else True,
+                    with_vectors=with_vectors
+                )
+                points.extend(records)
+                if offset is None:
+                    break
+            return points
+        except Exception as e:
+            print(f"❌ Scroll Error: {e}")
+            return None
+    
+    def scroll_payloads(self, collection_name, fields=None, batch_size=1000):
+        """Return {point_id: payload} for every point, without vectors (None on error)"""
+        records = self.scroll_points(collection_name, fields=fields, batch_size=batch_size)
+        if records is None:
+            return None
+        return {record.id: record.payload or {} for record in records}
+    
+    def search(self, collection_name, query_vector, limit=5, filters=None):
+        """
+        Top courses for a query vector, restricted to points matching filters
+        
+        A course has several chunk points; Qdrant groups hits by course_id
+        and keeps each course's best chunk (max-sim), so the result has one
+        point per course.
+        """
+        if not self.client:
+            return []
+        
+        query_filter = self.build_filter(filters)
         try:
             # Updated API for newer qdrant-client versions
-            results = self.client.query_points(
+            groups = self.client.query_points_groups(
                 collection_name=collection_name,
                 query=query_vector,
+                query_filter=query_filter,
+                group_by="course_id",
+                group_size=1,
                 limit=limit
-            ).points
-            return results
+            ).groups
+            return [group.hits[0] for group in groups if group.hits]
         except Exception as e:
             # Try old API as fallback
             try:
-                from qdrant_client.models import SearchRequest
-                results = self.client.search(
+                groups = self.client.search_groups(
                     collection_name=collection_name,
                     query_vector=query_vector,
+                    query_filter=query_filter,
+                    group_by="course_id",
+                    group_size=1,
                     limit=limit
-                )
-                return results
+                ).groups
+                return [group.hits[0] for group in groups if group.hits]
             except Exception as e2:
                 print(f"❌ Search Error: {e}")
                 return []
     
+    async def search_async(self, collection_name, query_vector, limit=5, filters=None):
+        """Non-blocking search for the asyncio pipeline"""
+        if not self.client:
+            return []
+        
+        if self.async_client is None:
+            self.async_client = AsyncQdrantClient(
+                url=Config.QDRANT_URL,
+                api_key=Config.QDRANT_API_KEY,
+            )
+        
+        try:
+            response = await self.async_client.query_points_groups(
+                collection_name=collection_name,
+                query=query_vector,
+                query_filter=self.build_filter(filters),
+                group_by="course_id",
+                group_size=1,
+                limit=limit
+            )
+            return [group.hits[0] for group in response.groups if group.hits]
+        except Exception as e:
+            print(f"❌ Search Error: {e}")
+            return []
+    
+    def set_collection_version(self, collection_name, version):
+        """Record the version of the last index run in Qdrant (called by the indexer)"""
+        if not self.client:
+            return False
+        
+        try:
+            if not self.collection_exists(META_COLLECTION):
+                self.client.create_collection(
+                    collection_name=META_COLLECTION,
+                    vectors_config=VectorParams(size=1, distance=Distance.DOT)
+                )
+            self.client.upsert(
+                collection_name=META_COLLECTION,
+                points=[PointStruct(
+                    id=str(uuid.uuid5(META_NAMESPACE, collection_name)),
+                    vector=[1.0],
+                    payload={'collection': collection_name, 'version': version}
+                )]
+            )
+            self.version_cache[collection_name] = (version, time.monotonic())
+            return True
+        except Exception as e:
+            print(f"❌ Version Update Error: {e}")
+            return False
+    
+    def get_collection_version(self, collection_name="curriculum"):
+        """
+        Version of the last index run, as recorded in Qdrant by the indexer
+        
+        The indexer bumps it whenever it changes the collection, so this
+        changes exactly when cached answers and the BM25 index go stale,
+        whichever host ran the indexer. Reads are cached for
+        Config.COLLECTION_VERSION_TTL seconds. Collections indexed before
+        the version point existed fall back to the local embedding store.
+        """
+        cached = self.version_cache.get(collection_name)
+        if cached is not None and time.monotonic() - cached[1] < Config.COLLECTION_VERSION_TTL:
+            return cached[0]
+        
+        version = None
+        if self.client:
+            try:
+                records = self.client.retrieve(
+                    collection_name=META_COLLECTION,
+                    ids=[str(uuid.uuid5(META_NAMESPACE, collection_name))],
+                    with_payload=True
+                )
+                if records:
+                    version = (records[0].payload or {}).get('version')
+            except Exception:
+                # No meta collection yet
+                pass
+        
+        if version is None:
+            from data.embedding_store import EmbeddingStore
+            version = EmbeddingStore().current_version()
+        
+        self.version_cache[collection_name] = (version, time.monotonic())
+        return version
+    
     def get_collection_info(self, collection_name="curriculum"):
         """Get info about collection"""
         if not self.client:
@@ -0,0 +1,36 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+def create_vector_backend(backend=None, collection_name="curriculum"):
+    """
+    Build the vector search backend selected by Config.VECTOR_BACKEND
+
+    'qdrant' returns a QdrantConnector. 'local' returns a LocalIndexConnector
+    backed by the memory-mapped EmbeddingStore, or filled once from Qdrant if
+    no store has been written yet. Either way searches are answered in-process.
+    """
+    backend = (backend or Config.VECTOR_BACKEND).lower()
+
+    if backend == "local":
+        from data.local_index import LocalIndexConnector
+        from data.embedding_store import EmbeddingStore
+
+        index = LocalIndexConnector()
+        if index.load_store(EmbeddingStore(), collection_name):
+            return index
+
+        from data.qdrant_connector import QdrantConnector
+        source = QdrantConnector()
+        if not source.client or not index.load_from(source, collection_name):
+            print(f"⚠️  Local index is empty: could not load '{collection_name}'")
+        return index
+
+    if backend == "qdrant":
+        from data.qdrant_connector import QdrantConnector
+        return QdrantConnector()
+
+    raise ValueError(f"Unknown vector backend: {backend}")
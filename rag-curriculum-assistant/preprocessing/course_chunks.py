@@ -0,0 +1,138 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+
+from config import Config
+
+
+# chunk_type payload values; 'course' is the one summary vector every course has
+CHUNK_TYPES = ('course', 'description', 'outcome', 'topic')
+
+
+def split_text(text, max_chars=None, overlap=None):
+    """
+    Split text into pieces of at most max_chars, preferring sentence ends
+
+    Consecutive pieces share about `overlap` characters, so a sentence cut
+    at a boundary still appears whole in one of them.
+    """
+    max_chars = max_chars or Config.CHUNK_CHARS
+    overlap = Config.CHUNK_OVERLAP if overlap is None else overlap
+    text = re.sub(r'\s+', ' ', text or '').strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # Back up to the last sentence (or word) end inside the window
+            cut = max(text.rfind('. ', start, end), text.rfind('; ', start, end))
+            if cut <= start + max_chars // 2:
+                cut = text.rfind(' ', start, end)
+            if cut > start + max_chars // 2:
+                end = cut + 1
+        pieces.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        next_start = max(end - overlap, start + 1)
+        # Start the next piece on a sentence boundary inside the overlap, else a word boundary
+        boundary = text.find('. ', next_start, end - 1)
+        if boundary != -1:
+            start = boundary + 2
+        else:
+            space = text.find(' ', next_start, end)
+            start = space + 1 if space != -1 else next_start
+    return pieces
+
+
+def course_header(course):
+    """'Course IT079: Databases' prefix that gives every chunk its course context"""
+    return f"Course {course.get('id', '')}: {course.get('name') or course.get('name_vn') or ''}"
+
+
+def course_chunks(course, outcomes=(), topics=()):
+    """
+    Extra (chunk_type, key, text) chunks of one course, besides its summary
+
+    - description: the full description in CHUNK_CHARS pieces, only when it
+      is longer than what the summary text already holds
+    - outcome: each learning outcome, English and Vietnamese separately
+    - topic: one chunk per teaching week (all topic details of that week)
+
+    key is stable across runs (outcome / topic IDs, piece numbers), so
+    re-indexing overwrites the same points.
+    """
+    header = course_header(course)
+    chunks = []
+
+    description = course.get('description') or ''
+    if len(description) > Config.CHUNK_CHARS:
+        for i, piece in enumerate(split_text(description)):
+            chunks.append(('description', f"description/{i}", f"{header}. Description: {piece}"))
+
+    for outcome in outcomes:
+        if outcome.get('description'):
+            chunks.append(('outcome', f"outcome/{outcome['id']}/en",
+                           f"{header}. Learning outcome: {outcome['description']}"))
+        if outcome.get('description_vn'):
+            chunks.append(('outcome', f"outcome/{outcome['id']}/vn",
+                           f"{header}. Chuẩn đầu ra: {outcome['description_vn']}"))
+
+    weeks = {}
+    for topic in topics:
+        if not topic.get('topic_detail'):
+            continue
+        week = topic.get('week')
+        parts = weeks.setdefault(week, [])
+        label = topic.get('topic_name')
+        parts.append(f"{label}: {topic['topic_detail']}" if label else topic['topic_detail'])
+
+    for week, parts in weeks.items():
+        prefix = f"{header}. Week {week}: " if week is not None else f"{header}. Topic: "
+        # A very long course name must not shrink the pieces to nothing
+        max_chars = max(Config.CHUNK_CHARS - len(prefix), Config.CHUNK_CHARS // 2)
+        for i, piece in enumerate(split_text("; ".join(parts), max_chars)):
+            chunks.append(('topic', f"topic/{week}/{i}", prefix + piece))
+
+    return chunks
+
+
+def group_rows(rows, key='course_id'):
+    """Yield (key value, rows) for runs of consecutive rows with the same key"""
+    current, group = None, []
+    for row in rows:
+        value = row.get(key)
+        if group and value != current:
+            yield current, group
+            group = []
+        current = value
+        group.append(row)
+    if group:
+        yield current, group
+
+
+def merge_by_course(courses, *streams):
+    """
+    Attach per-course rows from ordered streams to an ordered course stream
+
+    courses yields course dicts with 'id'; each stream yields (course_id,
+    rows) in the same order. Yields (course, [rows per stream]) holding only
+    one course's rows at a time. Stream rows of unknown courses are skipped.
+    """
+    heads = [next(stream, None) for stream in streams]
+    for course in courses:
+        course_id = course.get('id')
+        attached = []
+        for i, stream in enumerate(streams):
+            while heads[i] is not None and str(heads[i][0]) < str(course_id):
+                heads[i] = next(stream, None)
+            if heads[i] is not None and heads[i][0] == course_id:
+                attached.append(heads[i][1])
+                heads[i] = next(stream, None)
+            else:
+                attached.append([])
+        yield course, attached
@@ -7,24 +7,35 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-# Debug
-print(f"📂 Current dir: {current_dir}")
-print(f"📂 Parent dir: {parent_dir}")
-print(f"📂 sys.path[0]: {sys.path[0]}\n")
-
-from sentence_transformers import SentenceTransformer
+import time
+import hashlib
+import itertools
+import json
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+import numpy as np
 from data.mysql_connector import MySQLConnector
 from data.qdrant_connector import QdrantConnector
+from data.local_index import LocalIndexConnector
+from data.embedding_store import EmbeddingStore
+from data.payload_filter import normalize_value
+from preprocessing.course_chunks import CHUNK_TYPES, course_chunks, group_rows, merge_by_course
 from qdrant_client.models import PointStruct
+from rag.lazy import load_embedding_model
+from config import Config
 from tqdm import tqdm
 
+# Namespace for uuid5 point IDs derived from course IDs
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "curriculum-assistant/course")
+
 class EmbeddingCreator:
     def __init__(self):
         print(" Initializing...")
         
         # Connect to MySQL
         self.mysql = MySQLConnector()
-        if not self.mysql.connection:
+        if not self.mysql.is_connected():
             raise Exception("Failed to connect to MySQL")
         
         # Connect to Qdrant
@@ -32,9 +43,13 @@ class EmbeddingCreator:
         if not self.qdrant.client:
             raise Exception("Failed to connect to Qdrant")
         
+        # Local on-disk copy of the embeddings
+        self.store = EmbeddingStore()
+        
         # Load embedding model
         print(" Loading embedding model...")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model_name = Config.EMBEDDING_MODEL
+        self.model = load_embedding_model(self.model_name)
         print(" Model loaded\n")
     
     def create_course_text(self, course):
@@ -61,86 +76,308 @@ class EmbeddingCreator:
         if total > 0:
             text_parts.append(f"Credits: {total} ({theory} theory + {lab} lab)")
         
-        # Program
-        if course.get('program_name'):
-            text_parts.append(f"Program: {course['program_name']}")
+        # Programs
+        if course.get('program_names'):
+            text_parts.append(f"Program: {', '.join(course['program_names'])}")
         
         return ". ".join(text_parts)
     
-    def process_courses(self, batch_size=100, limit=None):
-        """Extract courses, create embeddings, upload to Qdrant"""
+    def build_payload(self, course, text, chunk_type='course'):
+        """Payload stored alongside each chunk vector (course fields repeated on every chunk)"""
+        payload = {
+            "course_id": course.get('id', ''),
+            "course_name": course.get('name', ''),
+            "name_vn": course.get('name_vn', ''),
+            "description": course.get('description', '')[:200] if course.get('description') else '',
+            "credits_theory": course.get('credit_theory', 0) or 0,
+            "credits_lab": course.get('credit_lab', 0) or 0,
+            "credits": (course.get('credit_theory', 0) or 0) + (course.get('credit_lab', 0) or 0),
+            "course_level_id": course.get('course_level_id'),
+            "program": ', '.join(course.get('program_names', [])),
+            "programs": course.get('program_names', []),
+            # Filter key: same normalization as the filter values (case-insensitive on every backend)
+            "program_keys": [normalize_value('program', p) for p in course.get('program_names', [])],
+            "chunk_type": chunk_type,
+            "text": text[:Config.CHUNK_CHARS + 100],  # Store for display, BM25 and rerank
+            "text_hash": self.hash_text(text)
+        }
+        payload["content_hash"] = self.content_hash(text, payload)
+        return payload
+    
+    def hash_text(self, text):
+        """Hash of the embedded text (rerank cache key)"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    def content_hash(self, text, payload):
+        """
+        Hash used to detect changed chunks between runs
         
-        # 1. Get courses from MySQL
-        print(" Extracting courses from MySQL...")
-        courses = self.mysql.get_all_courses()
+        Covers the full text and every payload field, not just the text:
+        chunk texts only carry the course header, so a program, credits or
+        course level change must still rewrite every chunk of the course.
+        """
+        fields = {k: v for k, v in payload.items() if k not in ("text_hash", "content_hash")}
+        data = text + "\n" + json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+    
+    def point_id(self, course_id, chunk_key=None):
+        """Deterministic point ID for a course (or one of its chunks), so re-upserts overwrite in place"""
+        name = str(course_id) if chunk_key is None else f"{course_id}/{chunk_key}"
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, name))
+    
+    def merge_programs(self, rows):
+        """
+        Collapse course rows into one course per ID (generator)
+        
+        The course query LEFT JOINs course_program, so a course in several
+        programs comes back once per program, on consecutive rows since the
+        stream is ordered by course. The program names are gathered into
+        'program_names' instead.
+        """
+        for _, group in group_rows(rows, key='id'):
+            course = dict(group[0])
+            course.pop('program_name', None)
+            course['program_names'] = []
+            for row in group:
+                program = row.get('program_name')
+                if program and program not in course['program_names']:
+                    course['program_names'].append(program)
+            yield course
+    
+    def iter_chunks(self, limit=None):
+        """
+        Yield (point_id, course, chunk_type, text) for every course, streamed from MySQL
         
+        Each course gives its summary text (create_course_text, same point ID
+        as before chunking) plus its course_chunks. Courses, learning outcomes
+        and topic details come from three ordered server-side cursors merged
+        per course, so only one course's rows are in memory at a time.
+        """
+        courses = self.merge_programs(self.mysql.stream_courses())
         if limit:
-            courses = courses[:limit]
+            courses = itertools.islice(courses, limit)
+        
+        streams = []
+        if Config.CHUNK_INDEXING:
+            streams = [
+                group_rows(self.mysql.stream_learning_outcomes()),
+                group_rows(self.mysql.stream_topic_details()),
+            ]
+        
+        for course, attached in merge_by_course(courses, *streams):
+            course_id = course.get('id', '')
+            text = self.create_course_text(course)
+            
+            # Skip if text too short
+            if len(text) >= 10:
+                yield self.point_id(course_id), course, 'course', text
+            
+            if streams:
+                for chunk_type, key, chunk_text in course_chunks(course, *attached):
+                    yield self.point_id(course_id, key), course, chunk_type, chunk_text
+    
+    def iter_windows(self, chunks, size):
+        """Group a chunk stream into lists of at most size"""
+        window = []
+        for chunk in chunks:
+            window.append(chunk)
+            if len(window) >= size:
+                yield window
+                window = []
+        if window:
+            yield window
+    
+    def stored_hashes(self):
+        """
+        {point_id: content_hash} of the points already in Qdrant (None if they can't be read)
+        
+        Points written before content hashes existed map to None, so they
+        count as changed and are rewritten.
+        """
+        existing = self.qdrant.scroll_payloads("curriculum", fields=["content_hash"])
+        if existing is None:
+            return None
+        return {str(point_id): payload.get('content_hash') for point_id, payload in existing.items()}
+    
+    def encode_texts(self, texts, encode_batch_size=None):
+        """Encode texts in length-sorted batches, returns float32 array in input order"""
+        encode_batch_size = encode_batch_size or Config.EMBEDDING_BATCH_SIZE
+        
+        if not texts:
+            return np.empty((0, Config.VECTOR_SIZE), dtype=np.float32)
+        
+        # Sort by length so each batch pads to a similar size
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        sorted_texts = [texts[i] for i in order]
+        
+        encoded = self.model.encode(
+            sorted_texts,
+            batch_size=encode_batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
         
-        print(f" Found {len(courses)} courses\n")
+        # Restore original order
+        embeddings = np.empty_like(encoded, dtype=np.float32)
+        embeddings[order] = encoded
+        return embeddings
+    
+    def process_courses(self, batch_size=100, limit=None, encode_batch_size=None, incremental=False):
+        """
+        Extract courses, create chunk embeddings, upload to Qdrant
+        
+        Chunks are streamed from MySQL and embedded / uploaded one window of
+        Config.INDEX_WINDOW chunks at a time; a full run spools each window
+        straight into a new EmbeddingStore version, so memory stays flat as
+        the chunk count grows.
+        
+        With incremental=True the existing collection is kept and only new or
+        changed chunks are embedded and upserted; points for removed courses
+        and chunks are deleted.
+        
+        If any upsert or delete fails, the store version is not committed and
+        no collection version is published, so caches and the BM25 index never
+        treat a partial collection as current. Returns False in that case.
+        """
+        start_time = time.perf_counter()
+        
+        # 1. Create collection (or read the hashes to diff against)
+        stored = None
+        if incremental and self.qdrant.collection_exists("curriculum"):
+            print(" Reading existing Qdrant points...")
+            stored = self.stored_hashes()
+            if stored is None:
+                print(" Could not read existing points, falling back to full rebuild")
+        incremental = stored is not None
         
-        # 2. Create collection
-        print(" Creating Qdrant collection...")
-        self.qdrant.create_collection("curriculum")
-        print()
+        if incremental:
+            # No-op for fields that are already indexed
+            self.qdrant.create_payload_indexes("curriculum")
+        else:
+            print(" Creating Qdrant collection...")
+            self.qdrant.create_collection("curriculum")
         
-        # 3. Process in batches
-        print(f" Creating embeddings and uploading (batch size: {batch_size})...\n")
+        # Full runs write the store as they go; incremental runs patch it at the end
+        writer = None if incremental else self.store.open_writer(self.model_name)
+        changed_ids, changed_embeddings, changed_payloads = [], [], []
         
-        points = []
+        # 2. Stream chunks from MySQL, embed and upload window by window
+        print(f"\n Streaming courses from MySQL (window: {Config.INDEX_WINDOW} chunks, "
+              f"encode batch size: {encode_batch_size or Config.EMBEDDING_BATCH_SIZE})...\n")
+        seen = set()
+        chunk_counts = Counter()
         total_uploaded = 0
+        failed_batches = failed_points = 0
+        encode_time = upload_time = 0.0
+        progress = tqdm(desc="Indexing", unit="chunk")
         
-        for idx, course in enumerate(tqdm(courses, desc="Processing")):
-            try:
-                # Create searchable text
-                text = self.create_course_text(course)
-                
-                # Skip if text too short
-                if len(text) < 10:
-                    continue
+        try:
+            for window in self.iter_windows(self.iter_chunks(limit), Config.INDEX_WINDOW):
+                progress.update(len(window))
+                chunk_counts.update(chunk_type for _, _, chunk_type, _ in window)
+                payloads = [self.build_payload(course, text, chunk_type) for _, course, chunk_type, text in window]
+                if incremental:
+                    seen.update(point_id for point_id, _, _, _ in window)
+                    changed = [
+                        (entry, payload) for entry, payload in zip(window, payloads)
+                        if stored.get(entry[0]) != payload['content_hash']
+                    ]
+                    window = [entry for entry, _ in changed]
+                    payloads = [payload for _, payload in changed]
+                    if not window:
+                        continue
                 
-                # Generate embedding
-                embedding = self.model.encode(text).tolist()
+                ids = [point_id for point_id, _, _, _ in window]
                 
-                # Create point
-                point = PointStruct(
-                    id=idx,
-                    vector=embedding,
-                    payload={
-                        "course_id": course.get('id', ''),
-                        "course_name": course.get('name', ''),
-                        "name_vn": course.get('name_vn', ''),
-                        "description": course.get('description', '')[:200] if course.get('description') else '',
-                        "credits_theory": course.get('credit_theory', 0) or 0,
-                        "credits_lab": course.get('credit_lab', 0) or 0,
-                        "program": course.get('program_name', ''),
-                        "text": text[:500]  # Store for display
-                    }
-                )
-                points.append(point)
+                encode_start = time.perf_counter()
+                embeddings = self.encode_texts([text for _, _, _, text in window], encode_batch_size)
+                encode_time += time.perf_counter() - encode_start
                 
-                # Upload in batches
-                if len(points) >= batch_size:
-                    success = self.qdrant.upsert_points("curriculum", points)
-                    if success:
+                upload_start = time.perf_counter()
+                for batch_start in range(0, len(ids), batch_size):
+                    batch_end = batch_start + batch_size
+                    points = [
+                        PointStruct(id=point_id, vector=embedding.tolist(), payload=payload)
+                        for point_id, payload, embedding in zip(
+                            ids[batch_start:batch_end],
+                            payloads[batch_start:batch_end],
+                            embeddings[batch_start:batch_end]
+                        )
+                    ]
+                    if self.qdrant.upsert_points("curriculum", points):
                         total_uploaded += len(points)
-                        print(f"   Uploaded batch: {total_uploaded}/{len(courses)}")
-                    points = []
+                    else:
+                        failed_batches += 1
+                        failed_points += len(points)
+                upload_time += time.perf_counter() - upload_start
                 
+                if writer is not None:
+                    writer.append(ids, embeddings, payloads)
+                else:
+                    changed_ids.extend(ids)
+                    changed_embeddings.append(embeddings)
+                    changed_payloads.extend(payloads)
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        finally:
+            progress.close()
+        
+        total_chunks = sum(chunk_counts.values())
+        print(f"\n Chunks: {total_chunks} ({', '.join(f'{t}: {chunk_counts[t]}' for t in CHUNK_TYPES if chunk_counts[t])})")
+        
+        # 3. Remove points of deleted courses / chunks
+        stale_ids = []
+        if incremental:
+            if not limit:
+                # A limited run only sees part of the catalog
+                stale_ids = [point_id for point_id in stored if point_id not in seen]
+            print(f"   Changed/new: {len(changed_ids)}, unchanged: {total_chunks - len(changed_ids)}, removed: {len(stale_ids)}")
+        
+        delete_failed = False
+        if stale_ids:
+            if self.qdrant.delete_points("curriculum", stale_ids):
+                print(f" Deleted {len(stale_ids)} removed chunks")
+            else:
+                delete_failed = True
+        failed = failed_batches or delete_failed
+        
+        # 4. Finish the on-disk embedding store
+        if failed:
+            if writer is not None:
+                writer.abort()
+            version = None
+            print(f"\n Upload incomplete: {failed_points} chunks in {failed_batches} failed batches"
+                  f"{', removed chunks not deleted' if delete_failed else ''}.")
+            print(" Not writing the embedding store or publishing a collection version;"
+                  " rerun (--incremental retries only what is missing).")
+        elif writer is not None:
+            try:
+                version = writer.commit()
             except Exception as e:
-                print(f"    Error processing course {course.get('id', '?')}: {e}")
-                continue
+                writer.abort()
+                print(f"    Error writing embedding store: {e}")
+                version = None
+        else:
+            embeddings = (np.concatenate(changed_embeddings) if changed_embeddings
+                          else np.empty((0, Config.VECTOR_SIZE), dtype=np.float32))
+            version = self.write_store(changed_ids, embeddings, changed_payloads, stale_ids)
+        if version:
+            print(f" Wrote embedding store version {version} to {self.store.root}")
         
-        # Upload remaining points
-        if points:
-            success = self.qdrant.upsert_points("curriculum", points)
-            if success:
-                total_uploaded += len(points)
-                print(f"   Uploaded final batch: {total_uploaded}/{len(courses)}")
+        # 5. Publish the version in Qdrant, so every serving host drops stale caches
+        if not failed and (not incremental or changed_ids or stale_ids):
+            published = version or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+            if self.qdrant.set_collection_version("curriculum", published):
+                print(f" Published collection version {published}")
         
-        print(f"\n Complete! Uploaded {total_uploaded} courses to Qdrant")
+        total_time = time.perf_counter() - start_time
         
-        # 4. Verify
+        print(f"\n Complete! Uploaded {total_uploaded} chunks to Qdrant")
+        self.print_timing_report(len(changed_ids) if incremental else total_chunks, encode_time, upload_time, total_time)
+        
+        # 6. Verify
         info = self.qdrant.get_collection_info("curriculum")
         if info:
             print(f"\n Qdrant Collection Stats:")
@@ -149,6 +386,44 @@ class EmbeddingCreator:
         
         # Cleanup
         self.mysql.close()
+        return not failed
+    
+    def write_store(self, ids, embeddings, payloads, stale_ids):
+        """
+        Apply an incremental run's changes as a new EmbeddingStore version
+        
+        The changes go on top of the current store version, or the (already
+        updated) Qdrant collection is re-read if there is no store yet.
+        """
+        if not ids and not stale_ids and self.store.current_version():
+            # Nothing changed, keep the current version (and downstream caches)
+            return self.store.current_version()
+        
+        local = LocalIndexConnector()
+        
+        try:
+            if local.load_store(self.store, build_ann=False):
+                collection = local.collections["curriculum"]
+                collection.upsert(ids, embeddings, payloads)
+                collection.delete(stale_ids)
+            elif not local.load_from(self.qdrant):
+                return None
+            
+            store_ids, store_vectors, store_payloads = local.collections["curriculum"].export()
+            return self.store.save(store_ids, store_vectors, store_payloads, model_name=self.model_name)
+        except Exception as e:
+            print(f"    Error writing embedding store: {e}")
+            return None
+    
+    def print_timing_report(self, count, encode_time, upload_time, total_time):
+        """Print throughput and encode/upload split"""
+        print(f"\n Timing Report:")
+        print(f"   Chunks embedded: {count}")
+        print(f"   Encode: {encode_time:.2f}s ({count / encode_time if encode_time else 0:.1f} chunks/sec)")
+        print(f"   Upload: {upload_time:.2f}s ({count / upload_time if upload_time else 0:.1f} chunks/sec)")
+        print(f"   Total:  {total_time:.2f}s ({count / total_time if total_time else 0:.1f} chunks/sec)")
+        if total_time:
+            print(f"   Split:  {encode_time / total_time:.0%} encode / {upload_time / total_time:.0%} upload")
 
 # Run
 if __name__ == "__main__":
@@ -162,11 +437,14 @@ if __name__ == "__main__":
         
         # Process all courses (or limit for testing)
         # creator.process_courses(batch_size=100, limit=50)  # Test with 50 first
-        creator.process_courses(batch_size=100)  # All courses
+        # creator.process_courses(batch_size=100, incremental=True)  # Nightly refresh
+        ok = creator.process_courses(batch_size=100, incremental="--incremental" in sys.argv)
         
         print("\n" + "=" * 60)
-        print(" SUCCESS!")
+        print(" SUCCESS!" if ok else " FAILED: some chunks were not uploaded")
         print("=" * 60)
+        if not ok:
+            sys.exit(1)
         
     except Exception as e:
         print(f"\n Error: {e}")
\ No newline at end of file
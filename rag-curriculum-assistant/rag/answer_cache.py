@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+from rag.embedding_cache import normalize_query
+
+
+class AnswerCache:
+    """
+    TTL + LRU cache of generated answers
+
+    Keys are (normalized query, route, retrieved course IDs, model name,
+    prompt version). Every lookup also passes the current collection
+    version; when it differs from the version the entries were built
+    against, the whole cache is dropped, so a reindex never serves answers
+    grounded in stale retrieval.
+    """
+
+    def __init__(self, max_size=None, ttl_seconds=None):
+        self.max_size = max_size or Config.ANSWER_CACHE_SIZE
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else Config.ANSWER_CACHE_TTL
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query, route, course_ids, model_name, prompt_version):
+        return (normalize_query(query), route, tuple(course_ids), model_name, prompt_version)
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key, version=None):
+        """Cached answer or None"""
+        with self.lock:
+            self._check_version(version)
+
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            answer, stored_at = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                del self.entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def put(self, key, answer, version=None):
+        with self.lock:
+            self._check_version(version)
+            self.entries[key] = (answer, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expired': self.expired,
+                'invalidations': self.invalidations,
+                'version': self.version,
+            }
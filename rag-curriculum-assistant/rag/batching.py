@@ -0,0 +1,198 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import Config
+
+
+class BatchingSLM:
+    """
+    Micro-batching front end for LocalSLM
+
+    Callers on any thread use generate_answer() as before (the asyncio
+    pipeline uses generate_answer_async()). Requests are queued
+    and a single worker thread collects up to max_batch_size of them, waiting
+    at most max_wait_ms after the first one arrives, then answers the whole
+    group with one LocalSLM.generate_batch call and hands each caller its own
+    result.
+    """
+
+    def __init__(self, slm, max_batch_size=None, max_wait_ms=None):
+        self.slm = slm
+        self.model_name = slm.model_name
+        self.PROMPT_VERSION = slm.PROMPT_VERSION
+        self.max_batch_size = max_batch_size or Config.LOCAL_SLM_MAX_BATCH
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else Config.LOCAL_SLM_MAX_WAIT_MS) / 1000
+
+        self.queue = queue.Queue()
+        self.closed = False
+        self.batches = 0
+        self.requests = 0
+        self.generate_seconds = 0.0
+
+        self.worker = threading.Thread(target=self._run, name="slm-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, query, context, max_tokens=300):
+        """Queue a question; returns a Future resolving to the answer"""
+        if self.closed:
+            raise RuntimeError("BatchingSLM is closed")
+        future = Future()
+        self.queue.put((query, context, max_tokens, future))
+        return future
+
+    def generate_answer(self, query, context, max_tokens=300):
+        return self.submit(query, context, max_tokens).result()
+
+    async def generate_answer_async(self, query, context, max_tokens=300):
+        """Awaitable generate_answer; cancelling it drops the request if it hasn't started"""
+        return await asyncio.wrap_future(self.submit(query, context, max_tokens))
+
+    def stream_answer(self, query, context, max_tokens=300, stats=None):
+        # Streaming is per-request by nature; bypass the batcher
+        return self.slm.stream_answer(query, context, max_tokens, stats)
+
+    async def stream_answer_async(self, query, context, max_tokens=300, stats=None):
+        """stream_answer for the asyncio pipeline: each chunk is awaited from a worker thread"""
+        chunks = self.slm.stream_answer(query, context, max_tokens, stats)
+        try:
+            while True:
+                text = await asyncio.to_thread(next, chunks, None)
+                if text is None:
+                    break
+                yield text
+        finally:
+            try:
+                chunks.close()
+            except ValueError:
+                # Still inside next() on the worker thread; it finishes on its own
+                pass
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # close() sentinel: finish this batch, then stop
+                self.queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                break
+
+            batch = self._collect(first)
+            # Callers that gave up (cancelled) don't need generating
+            batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                answers = self.slm.generate_batch(
+                    [(query, context) for query, context, _, _ in batch],
+                    max_tokens=[max_tokens for _, _, max_tokens, _ in batch]
+                )
+            except Exception as e:
+                for _, _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self.generate_seconds += time.perf_counter() - start
+                self.batches += 1
+                self.requests += len(batch)
+
+            for (_, _, _, future), answer in zip(batch, answers):
+                future.set_result(answer)
+
+    def close(self):
+        """Stop accepting requests; queued ones are still answered"""
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            self.worker.join()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'avg_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'generate_seconds': self.generate_seconds,
+        }
+
+
+# Benchmark: one-at-a-time vs micro-batched
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+    from rag.slm_local import LocalSLM
+
+    print("=" * 60)
+    print("🧪 LOCAL SLM THROUGHPUT: SEQUENTIAL vs MICRO-BATCHED")
+    print("=" * 60)
+
+    context = """Course IT079: Principles of Database Management
+Credits: 4 (3 theory + 1 lab)
+Description: Introduction to database concepts, SQL, normalization
+
+Course CSAI301: Machine Learning
+Credits: 4 (3 theory + 1 lab)
+Description: Supervised and unsupervised learning algorithms"""
+
+    questions = [
+        "What database courses are available?",
+        "How many credits is Machine Learning?",
+        "Which course covers SQL?",
+        "What is taught in CSAI301?",
+        "Is there a lab component in IT079?",
+        "Which courses have 4 credits?",
+        "What does normalization belong to?",
+        "Name a course about learning algorithms.",
+    ] * 2
+    max_tokens = 64
+
+    slm = LocalSLM("Qwen/Qwen2.5-1.5B-Instruct")
+    slm.generate_answer(questions[0], context, max_tokens=8)  # warm up
+
+    # Batched prompts are prefilled in full, so the like-for-like baseline
+    # runs without the prefix KV cache; the cached run is shown for reference
+    sequential = {}
+    for use_cache in (False, True):
+        slm.use_prefix_cache = use_cache
+        start = time.perf_counter()
+        for question in questions:
+            slm.generate_answer(question, context, max_tokens=max_tokens)
+        sequential[use_cache] = time.perf_counter() - start
+    slm.use_prefix_cache = Config.LOCAL_SLM_PREFIX_CACHE
+
+    batcher = BatchingSLM(slm)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+        answers = list(pool.map(lambda q: batcher.generate_answer(q, context, max_tokens), questions))
+    batched = time.perf_counter() - start
+    batcher.close()
+
+    print(f"\n📊 {len(questions)} questions, max {max_tokens} new tokens")
+    print(f"   Sequential:                {sequential[False]:.1f}s ({len(questions) / sequential[False] * 60:.1f} answers/min)")
+    print(f"   Sequential (prefix cache): {sequential[True]:.1f}s ({len(questions) / sequential[True] * 60:.1f} answers/min)")
+    print(f"   Batched:                   {batched:.1f}s ({len(questions) / batched * 60:.1f} answers/min)")
+    print(f"   Speedup:                   {sequential[False] / batched:.2f}x "
+          f"({sequential[True] / batched:.2f}x vs prefix-cached)")
+    print(f"   Batcher:    {batcher.stats()}")
+    print(f"\n💬 {questions[0]}\n{answers[0]}")
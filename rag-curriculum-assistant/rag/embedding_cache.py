@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+
+def normalize_query(query):
+    """Cache key text: case- and whitespace-insensitive (MiniLM is uncased)"""
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings
+
+    Keyed on (model name, normalized query) so switching models never serves
+    a vector from the wrong embedding space. Cached vectors are plain lists
+    shared between callers - treat them as read-only.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or Config.QUERY_CACHE_SIZE
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+    def encode(self, model, query, model_name=None):
+        """Return the embedding for query, computing it with model on a miss"""
+        key = (model_name or Config.EMBEDDING_MODEL, normalize_query(query))
+
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        start = time.perf_counter()
+        vector = model.encode(query).tolist()
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.misses += 1
+            self.encode_seconds += elapsed
+            self.entries[key] = vector
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+        return vector
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and an estimate of encode time saved by hits"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            avg_encode = self.encode_seconds / self.misses if self.misses else 0.0
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'encode_seconds': self.encode_seconds,
+                'saved_seconds': self.hits * avg_encode,
+            }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_query_embedding_cache():
+    """Process-wide cache shared by every search entry point"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = QueryEmbeddingCache()
+        return _shared_cache
@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+import time
+
+from config import Config
+from data.bm25_index import BM25Index, reciprocal_rank_fusion
+
+
+class HybridRetriever:
+    """
+    Dense vector search + BM25, fused with reciprocal rank fusion
+
+    The BM25 index is built in-process from the vector backend's payloads
+    on first use and rebuilt when the collection version changes, so a
+    query costs one dense search plus an in-memory lexical lookup, with no
+    extra network calls. With Config.HYBRID_SEARCH off, or if payloads
+    can't be read, it returns the dense results unchanged. Payload filters
+    are passed to both sides, so each ranks only matching courses.
+    """
+
+    def __init__(self, backend, collection_name="curriculum", candidates=None, rrf_k=None, enabled=None,
+                 retry_interval=None):
+        self.backend = backend
+        self.collection_name = collection_name
+        self.candidates = candidates or Config.HYBRID_CANDIDATES
+        self.rrf_k = rrf_k or Config.RRF_K
+        self.enabled = Config.HYBRID_SEARCH if enabled is None else enabled
+        # Seconds to wait after a failed payload scroll before scrolling again
+        self.retry_interval = Config.COLLECTION_VERSION_TTL if retry_interval is None else retry_interval
+
+        self.index = None
+        self.index_version = None
+        self.failed_version = None
+        self.failed_at = None
+        self.lock = threading.Lock()
+
+    def lexical_index(self):
+        """
+        Current BM25 index, (re)built when the collection version changed
+
+        Blocking: reads the collection version and, on a change, scrolls
+        every payload. While one caller rebuilds, others keep using the
+        previous index instead of queueing on the lock.
+        """
+        version = self.backend.get_collection_version(self.collection_name)
+        if self.index is not None and self.index_version == version:
+            return self.index
+        if self.failed_version == version and time.monotonic() - self.failed_at < self.retry_interval:
+            return self.index
+
+        if not self.lock.acquire(blocking=self.index is None):
+            return self.index
+        try:
+            if self.index is None or self.index_version != version:
+                points = self.backend.scroll_payloads(self.collection_name)
+                if not points:
+                    self.failed_version = version
+                    self.failed_at = time.monotonic()
+                    return self.index
+                self.index = BM25Index(points)
+                self.index_version = version
+                self.failed_version = None
+                print(f"✅ BM25 index built: {len(self.index)} documents, {len(self.index.vocab)} terms")
+        finally:
+            self.lock.release()
+        return self.index
+
+    def fuse(self, query, dense, limit, filters=None, index=None):
+        if index is None:
+            index = self.lexical_index()
+        if index is None:
+            return dense[:limit]
+        lexical = index.search(query, self.candidates, filters)
+        return reciprocal_rank_fusion([dense, lexical], limit, self.rrf_k)
+
+    def search(self, query, query_vector, limit=5, filters=None):
+        if not self.enabled:
+            return self.backend.search(self.collection_name, query_vector, limit=limit, filters=filters)
+        dense = self.backend.search(self.collection_name, query_vector, limit=max(limit, self.candidates), filters=filters)
+        return self.fuse(query, dense, limit, filters)
+
+    async def search_async(self, query, query_vector, limit=5, filters=None):
+        if not self.enabled:
+            return await self.backend.search_async(self.collection_name, query_vector, limit=limit, filters=filters)
+        # The version read (a Qdrant call once per TTL) and any rebuild block,
+        # so they run off the loop, overlapping the dense search
+        dense, index = await asyncio.gather(
+            self.backend.search_async(
+                self.collection_name, query_vector, limit=max(limit, self.candidates), filters=filters
+            ),
+            asyncio.to_thread(self.lexical_index),
+        )
+        # Lexical side is in-memory and sub-millisecond once built
+        if index is None:
+            return dense[:limit]
+        return self.fuse(query, dense, limit, filters, index=index)
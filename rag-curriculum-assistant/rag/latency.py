@@ -0,0 +1,58 @@
+import threading
+from collections import defaultdict, deque
+
+
+class RouteLatency:
+    """
+    Per-route latency counters for HybridRAG.ask
+
+    Keeps count / total / max per route plus the most recent samples for
+    percentiles. Routes are free-form labels, e.g. 'prerequisite:fast' for
+    answers served straight from SQL and 'semantic' for vector search + LLM.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.counts = defaultdict(int)
+        self.totals = defaultdict(float)
+        self.maxima = defaultdict(float)
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, route, seconds):
+        with self.lock:
+            self.counts[route] += 1
+            self.totals[route] += seconds
+            self.maxima[route] = max(self.maxima[route], seconds)
+            self.samples[route].append(seconds)
+
+    @staticmethod
+    def percentile(sorted_samples, p):
+        if not sorted_samples:
+            return 0.0
+        k = min(len(sorted_samples) - 1, int(round(p / 100 * (len(sorted_samples) - 1))))
+        return sorted_samples[k]
+
+    def stats(self):
+        """{route: {count, avg_ms, p50_ms, p95_ms, max_ms}}"""
+        with self.lock:
+            result = {}
+            for route, count in self.counts.items():
+                samples = sorted(self.samples[route])
+                result[route] = {
+                    'count': count,
+                    'avg_ms': self.totals[route] / count * 1000,
+                    'p50_ms': self.percentile(samples, 50) * 1000,
+                    'p95_ms': self.percentile(samples, 95) * 1000,
+                    'max_ms': self.maxima[route] * 1000,
+                }
+            return result
+
+    def report(self):
+        stats = self.stats()
+        if not stats:
+            print(" No questions answered yet")
+            return
+        for route, s in sorted(stats.items()):
+            print(f"   {route:<22} n={s['count']:<5} avg {s['avg_ms']:8.2f} ms | "
+                  f"p50 {s['p50_ms']:8.2f} ms | p95 {s['p95_ms']:8.2f} ms | max {s['max_ms']:8.2f} ms")
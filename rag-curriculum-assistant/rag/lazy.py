@@ -0,0 +1,121 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+
+from config import Config
+
+
+class LazyLoader:
+    """
+    Stand-in for an expensive object that is built on first use
+
+    Attribute access is forwarded to the real object, so callers keep writing
+    self.embedding_model.encode(...) / self.slm.generate_answer(...) and only
+    the code paths that actually touch it pay for loading. warm() starts the
+    load on a background thread; a get() that arrives meanwhile waits for it
+    instead of loading twice.
+    """
+
+    def __init__(self, factory, name):
+        self._factory = factory
+        self._name = name
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._warm_thread = None
+        self.load_seconds = None
+
+    def get(self):
+        if self._loaded:
+            return self._value
+
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                self._value = self._factory()
+                self.load_seconds = time.perf_counter() - start
+                self._loaded = True
+                print(f"✅ {self._name} loaded in {self.load_seconds:.2f}s")
+        return self._value
+
+    def warm(self):
+        """Start loading in the background (no-op once loaded or loading)"""
+        if self._loaded or self._warm_thread is not None:
+            return
+
+        def load():
+            try:
+                self.get()
+            except Exception as e:
+                # The next get() retries and raises to its caller
+                print(f"⚠️  Background load of {self._name} failed: {e}")
+
+        self._warm_thread = threading.Thread(target=load, name=f"warm-{self._name}", daemon=True)
+        self._warm_thread.start()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def __getattr__(self, attr):
+        # Only called for attributes LazyLoader itself doesn't have
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+
+# ========== FACTORIES ==========
+# Heavy libraries are imported inside these, not at module import time
+
+def load_embedding_model(model_name=None):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name or Config.EMBEDDING_MODEL)
+
+
+def load_cross_encoder(model_name=None):
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name or Config.RERANK_MODEL, device="cpu")
+
+
+def load_openrouter_slm(model_name="meta-llama/llama-3.2-3b-instruct"):
+    from rag.slm_openrouter import OpenRouterSLM
+    return OpenRouterSLM(model_name)
+
+
+def load_local_slm(model_name=None):
+    """LocalSLM behind the micro-batcher, so concurrent questions share generate calls"""
+    from rag.slm_local import LocalSLM
+    from rag.batching import BatchingSLM
+    return BatchingSLM(LocalSLM(model_name or Config.LOCAL_SLM_MODEL))
+
+
+def load_slm():
+    """Answer generator picked by Config.SLM_BACKEND"""
+    if Config.SLM_BACKEND == 'local':
+        return load_local_slm()
+    if Config.SLM_BACKEND != 'openrouter':
+        raise ValueError(f"Unknown SLM_BACKEND: {Config.SLM_BACKEND}")
+    return load_openrouter_slm()
+
+
+def load_groq_client():
+    from groq import Groq
+    return Groq(api_key=Config.GROQ_API_KEY)
+
+
+_embedding_models = {}
+_embedding_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_name=None):
+    """Process-wide lazy embedding model (one load per model name)"""
+    model_name = model_name or Config.EMBEDDING_MODEL
+    with _embedding_models_lock:
+        if model_name not in _embedding_models:
+            _embedding_models[model_name] = LazyLoader(
+                lambda: load_embedding_model(model_name), f"Embedding model {model_name}"
+            )
+        return _embedding_models[model_name]
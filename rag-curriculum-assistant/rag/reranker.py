@@ -0,0 +1,155 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+from data.bm25_index import document_text
+from data.local_index import LocalScoredPoint
+from rag.embedding_cache import normalize_query
+from rag.lazy import LazyLoader, load_cross_encoder
+
+
+class CrossEncoderReranker:
+    """
+    Rerank retrieval candidates with a small CPU cross-encoder
+
+    At most `candidates` hits are scored, all uncached (query, course) pairs
+    in one batched predict call. Pair scores are cached (LRU) on the
+    normalized query and the document text hash, so repeated questions cost
+    nothing. The latency budget is enforced before scoring: the expected
+    time (pairs to score x measured seconds per pair) must fit, otherwise
+    the original ranking is returned. The first predict call (warm-up) is
+    not measured, and every probe_every-th over-budget query is scored
+    anyway to re-measure, so one slow call can't disable reranking for
+    good. While the model is still loading, results pass through unchanged.
+    """
+
+    def __init__(self, model_name=None, candidates=None, budget_ms=None, cache_size=None, enabled=None, probe_every=20):
+        self.model_name = model_name or Config.RERANK_MODEL
+        self.candidates = candidates or Config.RERANK_CANDIDATES
+        self.budget = (Config.RERANK_BUDGET_MS if budget_ms is None else budget_ms) / 1000
+        self.cache_size = cache_size or Config.RERANK_CACHE_SIZE
+        self.enabled = Config.RERANK if enabled is None else enabled
+
+        self.model = LazyLoader(lambda: load_cross_encoder(self.model_name), f"Cross-encoder {self.model_name}")
+        self.scores = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Running estimate of predict cost per pair (None until first measured)
+        self.seconds_per_pair = None
+        self.predict_calls = 0
+        self.probe_every = probe_every
+        self.skips_since_probe = 0
+        self.counters = {'reranked': 0, 'skipped_budget': 0, 'skipped_loading': 0, 'pair_hits': 0, 'pair_misses': 0}
+        self.rerank_seconds = 0.0
+
+    def count(self, name, n=1):
+        # Called from asyncio.to_thread workers
+        with self.lock:
+            self.counters[name] += n
+
+    def warm(self):
+        if self.enabled:
+            self.model.warm()
+
+    def pair_key(self, query, payload):
+        text = document_text(payload)
+        text_hash = payload.get('text_hash') or hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return (normalize_query(query), payload.get('course_id'), text_hash)
+
+    def rerank(self, query, results, top_k=5, wait=False):
+        """
+        Top top_k of results reordered by cross-encoder score
+
+        wait=True loads the model if needed instead of passing results through.
+        """
+        if not self.enabled or len(results) <= 1:
+            return results[:top_k]
+        if not self.model.loaded and not wait:
+            self.model.warm()
+            self.count('skipped_loading')
+            return results[:top_k]
+
+        start = time.perf_counter()
+        candidates = results[:self.candidates]
+        keys = [self.pair_key(query, r.payload or {}) for r in candidates]
+
+        scores = {}
+        with self.lock:
+            for key in keys:
+                if key in self.scores:
+                    self.scores.move_to_end(key)
+                    scores[key] = self.scores[key]
+        missing = [(key, r) for key, r in zip(keys, candidates) if key not in scores]
+        with self.lock:
+            self.counters['pair_hits'] += len(candidates) - len(missing)
+            self.counters['pair_misses'] += len(missing)
+
+        if missing:
+            check = self.budget_check(len(missing))
+            if check == 'skip':
+                self.count('skipped_budget')
+                return results[:top_k]
+
+            model = self.model.get()
+            predict_start = time.perf_counter()
+            predicted = model.predict(
+                [(query, document_text(r.payload or {})) for _, r in missing],
+                batch_size=len(missing),
+                show_progress_bar=False
+            )
+            self.measure((time.perf_counter() - predict_start) / len(missing), probe=check == 'probe')
+
+            with self.lock:
+                for (key, _), score in zip(missing, predicted):
+                    scores[key] = float(score)
+                    self.scores[key] = float(score)
+                    self.scores.move_to_end(key)
+                while len(self.scores) > self.cache_size:
+                    self.scores.popitem(last=False)
+
+        ranked = sorted(zip(keys, candidates), key=lambda item: -scores[item[0]])[:top_k]
+        with self.lock:
+            self.counters['reranked'] += 1
+            self.rerank_seconds += time.perf_counter() - start
+        return [LocalScoredPoint(r.id, scores[key], r.payload) for key, r in ranked]
+
+    def budget_check(self, pairs):
+        """'ok' if scoring pairs fits the budget, else 'skip' (or 'probe' to re-measure anyway)"""
+        if not self.budget or self.seconds_per_pair is None or pairs * self.seconds_per_pair <= self.budget:
+            return 'ok'
+        with self.lock:
+            self.skips_since_probe += 1
+            if self.skips_since_probe >= self.probe_every:
+                self.skips_since_probe = 0
+                return 'probe'
+        return 'skip'
+
+    def measure(self, per_pair, probe=False):
+        with self.lock:
+            self.predict_calls += 1
+            if self.predict_calls == 1:
+                # First call includes warm-up (lazy init, allocator, caches)
+                return
+            if probe or self.seconds_per_pair is None:
+                # A probe runs only while the estimate says 'too slow': take the fresh number as is
+                self.seconds_per_pair = per_pair
+            else:
+                # Smooth so one slow call doesn't disable reranking
+                self.seconds_per_pair = 0.8 * self.seconds_per_pair + 0.2 * per_pair
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        reranked = counters['reranked']
+        return dict(
+            counters,
+            avg_rerank_ms=self.rerank_seconds / reranked * 1000 if reranked else 0.0,
+            ms_per_pair=(self.seconds_per_pair or 0.0) * 1000,
+            cached_pairs=len(self.scores),
+        )
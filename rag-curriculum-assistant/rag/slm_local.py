@@ -3,11 +3,44 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import copy
+import hashlib
+from threading import Thread, Lock, Event
+
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import (
+    AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer,
+    StoppingCriteria, StoppingCriteriaList
+)
+from rag.streaming import StreamStats
+from config import Config
+
+class StopOnEvent(StoppingCriteria):
+    """Ends generation at the next token once the event is set (consumer went away)"""
+    
+    def __init__(self, event):
+        self.event = event
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
 
 class LocalSLM:
-    def __init__(self, model_name="Qwen/Qwen2.5-1.5B-Instruct"):
+    # Bump when the prompt below changes (part of answer cache keys)
+    PROMPT_VERSION = 1
+    
+    SYSTEM_PROMPT = """You are a helpful curriculum assistant for International University (IU).
+Provide direct, concise answers based only on the given curriculum information.
+
+Rules:
+- Be concise and factual
+- Cite course IDs (e.g., IT079, CSAI301)
+- Use bullet points for lists
+- If information is not provided, say "Not found in curriculum"
+- Be professional"""
+    
+    MAX_PROMPT_TOKENS = 2048
+    
+    def __init__(self, model_name="Qwen/Qwen2.5-1.5B-Instruct", cpu_mode=None, num_threads=None):
         """
         Initialize local Small Language Model
         
@@ -18,12 +51,22 @@ class LocalSLM:
         For 8GB+ VRAM:
         - Qwen/Qwen2.5-3B-Instruct (~3GB VRAM)
         - microsoft/Phi-3-mini-4k-instruct (~3.5GB VRAM)
+        
+        Without CUDA, cpu_mode ('fp32', 'bf16', 'int8') and num_threads
+        default to Config.LOCAL_SLM_CPU_MODE / Config.LOCAL_SLM_THREADS.
         """
         print(f"🔧 Loading SLM: {model_name}")
         print("📥 First run will download model (~3GB)...")
         
         self.model_name = model_name
+        
+        # Fixed system-prompt prefix: token IDs + past key values, computed once
+        self.use_prefix_cache = Config.LOCAL_SLM_PREFIX_CACHE
+        self.prefix_cache = None
+        self.prefix_lock = Lock()
+        
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.cpu_mode = None
         
         print(f"💻 Device: {self.device}")
         
@@ -32,6 +75,10 @@ class LocalSLM:
             model_name,
             trust_remote_code=True
         )
+        # Batched generation pads on the left so every prompt ends at the last column
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
         
         # Load model - simple approach for 1.5B
         if self.device == "cuda":
@@ -43,47 +90,132 @@ class LocalSLM:
             )
             print(f"✅ Model loaded on GPU (FP16)\n")
         else:
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                torch_dtype=torch.float32,
-                device_map="cpu",
-                trust_remote_code=True
-            )
-            print(f"✅ Model loaded on CPU (FP32)\n")
+            self.cpu_mode = cpu_mode or Config.LOCAL_SLM_CPU_MODE
+            self.model = self.load_cpu_model(model_name, self.cpu_mode, num_threads)
+            print(f"✅ Model loaded on CPU ({self.cpu_mode.upper()}, {torch.get_num_threads()} threads)\n")
     
-    def generate_answer(self, query, context, max_tokens=300):
-        """Generate answer using local SLM"""
+    @staticmethod
+    def load_cpu_model(model_name, cpu_mode="fp32", num_threads=None):
+        """
+        Load the model for CPU inference
         
-        # Build prompt (Qwen format)
-        system_prompt = """You are a helpful curriculum assistant for International University (IU).
-Provide direct, concise answers based only on the given curriculum information.
-
-Rules:
-- Be concise and factual
-- Cite course IDs (e.g., IT079, CSAI301)
-- Use bullet points for lists
-- If information is not provided, say "Not found in curriculum"
-- Be professional"""
-
-        prompt = f"""<|im_start|>system
-{system_prompt}<|im_end|>
+        fp32: full precision baseline (~6GB for 1.5B)
+        bf16: half the memory; fast on CPUs with AVX512-BF16/AMX, slower elsewhere
+        int8: dynamic int8 quantization of every nn.Linear (weights stored int8,
+              activations quantized on the fly); embeddings/norms stay fp32
+        """
+        if cpu_mode not in ("fp32", "bf16", "int8"):
+            raise ValueError(f"Unknown LOCAL_SLM_CPU_MODE: {cpu_mode}")
+        
+        num_threads = num_threads if num_threads is not None else Config.LOCAL_SLM_THREADS
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.bfloat16 if cpu_mode == "bf16" else torch.float32,
+            device_map="cpu",
+            trust_remote_code=True
+        )
+        model.eval()
+        
+        if cpu_mode == "int8":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+    
+    def prompt_prefix(self):
+        """Part of the prompt that is identical for every question"""
+        return f"""<|im_start|>system
+{self.SYSTEM_PROMPT}<|im_end|>
 <|im_start|>user
 Curriculum Information:
-{context}
+"""
+    
+    def prompt_suffix(self, query, context):
+        """Per-question part of the prompt"""
+        return f"""{context}
 
 Question: {query}<|im_end|>
 <|im_start|>assistant
 """
-        
-        # Tokenize
-        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=2048)
+    
+    def build_prompt(self, query, context):
+        """Qwen chat-format prompt for a curriculum question"""
+        return self.prompt_prefix() + self.prompt_suffix(query, context)
+    
+    def tokenize(self, prompt):
+        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=self.MAX_PROMPT_TOKENS)
         
         # Move to device
         if self.device == "cuda":
             inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        return inputs
+    
+    def get_prefix_cache(self):
+        """
+        (prefix token IDs, past key values) for the system-prompt prefix
+        
+        Rebuilt whenever the model object, its dtype/device or the prefix text
+        changes, so a reloaded model or edited prompt never reuses stale keys.
+        """
+        prefix = self.prompt_prefix()
+        key = (
+            self.model_name,
+            id(self.model),
+            str(self.model.dtype),
+            str(self.model.device),
+            hashlib.sha256(prefix.encode("utf-8")).hexdigest(),
+        )
+        
+        with self.prefix_lock:
+            if self.prefix_cache is None or self.prefix_cache[0] != key:
+                prefix_ids = self.tokenizer(prefix, return_tensors="pt", add_special_tokens=False).input_ids
+                prefix_ids = prefix_ids.to(self.model.device)
+                with torch.inference_mode():
+                    past_key_values = self.model(prefix_ids, use_cache=True).past_key_values
+                self.prefix_cache = (key, prefix_ids, past_key_values)
+            
+            _, prefix_ids, past_key_values = self.prefix_cache
+            return prefix_ids, past_key_values
+    
+    def invalidate_prefix_cache(self):
+        with self.prefix_lock:
+            self.prefix_cache = None
+    
+    def prepare_inputs(self, query, context):
+        """
+        model.generate inputs for a question
+        
+        With the prefix cache on, only the context + question are prefilled:
+        generate gets the full token IDs plus a copy of the cached prefix
+        keys/values (generate extends the cache in place, so the shared one
+        must not be handed out).
+        """
+        if not self.use_prefix_cache:
+            return self.tokenize(self.build_prompt(query, context))
+        
+        prefix_ids, past_key_values = self.get_prefix_cache()
+        suffix_ids = self.tokenizer(
+            self.prompt_suffix(query, context),
+            return_tensors="pt",
+            add_special_tokens=False,
+            truncation=True,
+            max_length=self.MAX_PROMPT_TOKENS - prefix_ids.shape[1]
+        ).input_ids.to(prefix_ids.device)
+        
+        input_ids = torch.cat([prefix_ids, suffix_ids], dim=1)
+        return {
+            'input_ids': input_ids,
+            'attention_mask': torch.ones_like(input_ids),
+            'past_key_values': copy.deepcopy(past_key_values),
+        }
+    
+    def generate_answer(self, query, context, max_tokens=300):
+        """Generate answer using local SLM"""
+        inputs = self.prepare_inputs(query, context)
         
         # Generate
-        with torch.no_grad():
+        with torch.inference_mode():
             outputs = self.model.generate(
                 **inputs,
                 max_new_tokens=max_tokens,
@@ -94,28 +226,128 @@ Question: {query}<|im_end|>
                 eos_token_id=self.tokenizer.eos_token_id
             )
         
-        # Decode
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        return self.decode_answer(outputs[0], inputs['input_ids'].shape[1])
+    
+    def decode_answer(self, output_ids, prompt_len, max_tokens=None):
+        """Generated text after the prompt (same format for single and batched generation)"""
+        generated = output_ids[prompt_len:] if max_tokens is None else output_ids[prompt_len:prompt_len + max_tokens]
+        return self.tokenizer.decode(generated, skip_special_tokens=True).strip()
+
+    def generate_batch(self, requests, max_tokens=300):
+        """
+        Generate answers for several (query, context) pairs in one forward pass
         
-        # Extract answer (after assistant tag)
-        if "<|im_start|>assistant" in response:
-            answer = response.split("<|im_start|>assistant")[-1].strip()
-        else:
-            answer = response.split("Question:")[-1].strip() if "Question:" in response else response
+        Prompts are left-padded to a common length. The shared prefix cache is
+        not used here (its keys sit at fixed positions, which left padding
+        would shift). max_tokens may be a single value or one per request;
+        generation runs to the largest and each answer is cut to its own limit.
+        """
+        if isinstance(max_tokens, int):
+            max_tokens = [max_tokens] * len(requests)
+        
+        prompts = [self.build_prompt(query, context) for query, context in requests]
+        inputs = self.tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.MAX_PROMPT_TOKENS
+        )
+        if self.device == "cuda":
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=max(max_tokens),
+                temperature=0.3,
+                top_p=0.9,
+                do_sample=True,
+                pad_token_id=self.tokenizer.pad_token_id,
+                eos_token_id=self.tokenizer.eos_token_id
+            )
+        
+        # Everything after the padded prompt is generated text
+        prompt_len = inputs['input_ids'].shape[1]
+        return [self.decode_answer(output, prompt_len, limit) for output, limit in zip(outputs, max_tokens)]
+    
+    def stream_answer(self, query, context, max_tokens=300, stats=None):
+        """
+        Yield the answer as it is generated
+        
+        model.generate runs on a background thread and pushes decoded text
+        into a TextIteratorStreamer. TTFT and tokens/sec go into stats (owned
+        by the caller). If generation fails an "Error: ..." chunk is yielded
+        and stats.error is set. Closing the generator early stops generation
+        at the next token instead of running to max_tokens.
+        """
+        stats = stats or StreamStats()
+        
+        inputs = self.prepare_inputs(query, context)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        stop = Event()
+        
+        def generate():
+            try:
+                with torch.inference_mode():
+                    self.model.generate(
+                        **inputs,
+                        max_new_tokens=max_tokens,
+                        temperature=0.3,
+                        top_p=0.9,
+                        do_sample=True,
+                        pad_token_id=self.tokenizer.eos_token_id,
+                        eos_token_id=self.tokenizer.eos_token_id,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([StopOnEvent(stop)])
+                    )
+            except Exception as e:
+                stats.error = str(e)
+                # Unblock the consumer loop below
+                streamer.end()
         
-        return answer
+        thread = Thread(target=generate, daemon=True)
+        thread.start()
+        
+        try:
+            for text in streamer:
+                if text:
+                    stats.chunk(text, tokens=len(self.tokenizer.encode(text, add_special_tokens=False)))
+                    yield text
+            if stats.error is not None:
+                yield f"Error: {stats.error}"
+        finally:
+            stop.set()
+            thread.join()
+            stats.finish()
+
+def benchmark_cpu_mode(model_name, cpu_mode, query, context, max_tokens=64):
+    """Load time, peak RSS and tokens/sec for one CPU mode (run in a fresh process)"""
+    import resource
+    import time
+    
+    start = time.perf_counter()
+    slm = LocalSLM(model_name, cpu_mode=cpu_mode)
+    load_seconds = time.perf_counter() - start
+    
+    slm.generate_answer(query, context, max_tokens=8)  # warm up
+    stats = StreamStats()
+    for text in slm.stream_answer(query, context, max_tokens=max_tokens, stats=stats):
+        pass
+    
+    return {
+        'mode': cpu_mode,
+        'load_seconds': load_seconds,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'ttft': stats.ttft,
+        'tokens_per_sec': stats.tokens_per_sec,
+    }
 
 # Test
 if __name__ == "__main__":
-    print("=" * 60)
-    print("🧪 TESTING LOCAL SLM (Qwen 1.5B)")
-    print("=" * 60)
-    print()
-    
-    # Initialize
-    slm = LocalSLM("Qwen/Qwen2.5-1.5B-Instruct")
+    import json
+    import subprocess
     
-    # Test query
     context = """Course IT079: Principles of Database Management
 Credits: 4 (3 theory + 1 lab)
 Description: Introduction to database concepts, SQL, normalization
@@ -126,6 +358,39 @@ Description: Supervised and unsupervised learning algorithms"""
     
     query = "What database courses are available?"
     
+    if "--cpu-bench-mode" in sys.argv:
+        # Child process of --cpu-benchmark: one mode, result as JSON on the last line
+        mode = sys.argv[sys.argv.index("--cpu-bench-mode") + 1]
+        print(json.dumps(benchmark_cpu_mode("Qwen/Qwen2.5-1.5B-Instruct", mode, query, context)))
+        sys.exit(0)
+    
+    if "--cpu-benchmark" in sys.argv:
+        # Separate processes so peak RSS of one mode doesn't leak into the next
+        print("=" * 60)
+        print("🧪 CPU MODES: FP32 vs BF16 vs INT8")
+        print("=" * 60)
+        env = dict(os.environ, CUDA_VISIBLE_DEVICES="")
+        for mode in ("fp32", "bf16", "int8"):
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--cpu-bench-mode", mode],
+                capture_output=True, text=True, env=env
+            )
+            if result.returncode != 0:
+                print(f"❌ {mode}: {result.stderr.strip().splitlines()[-1:]}")
+                continue
+            r = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{mode:>5}: load {r['load_seconds']:.1f}s | peak RSS {r['peak_rss_mb']:.0f} MB | "
+                  f"TTFT {r['ttft'] or 0:.2f}s | {r['tokens_per_sec']:.1f} tok/s")
+        sys.exit(0)
+    
+    print("=" * 60)
+    print("🧪 TESTING LOCAL SLM (Qwen 1.5B)")
+    print("=" * 60)
+    print()
+    
+    # Initialize
+    slm = LocalSLM("Qwen/Qwen2.5-1.5B-Instruct")
+    
     print("📝 Query:", query)
     print("\n🤖 Generating answer...\n")
     
@@ -135,4 +400,24 @@ Description: Supervised and unsupervised learning algorithms"""
     print("ANSWER:")
     print("=" * 60)
     print(answer)
-    print()
\ No newline at end of file
+    print()
+    
+    print("=" * 60)
+    print("STREAMED ANSWER:")
+    print("=" * 60)
+    stats = StreamStats()
+    for text in slm.stream_answer(query, context, stats=stats):
+        print(text, end="", flush=True)
+    stats.report("Local stream")
+    print()
+    
+    # Prefix cache vs full prefill (first token latency)
+    import time
+    for use_cache in (False, True):
+        slm.use_prefix_cache = use_cache
+        slm.generate_answer(query, context, max_tokens=1)  # warm up
+        start = time.perf_counter()
+        for _ in range(5):
+            slm.generate_answer(query, context, max_tokens=1)
+        elapsed = (time.perf_counter() - start) / 5 * 1000
+        print(f"⏱️  Prefix cache {'on ' if use_cache else 'off'}: {elapsed:.1f} ms to first token")
@@ -3,9 +3,13 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from rag.streaming import StreamStats
 
 class OpenRouterSLM:
+    # Bump when the system/user prompt below changes (part of answer cache keys)
+    PROMPT_VERSION = 1
+    
     def __init__(self, model_name="meta-llama/llama-3.2-3b-instruct"):
         """
         OpenRouter FREE SLMs:
@@ -19,6 +23,7 @@ class OpenRouterSLM:
             api_key=os.getenv('OPENROUTER_API_KEY') 
         )
         self.model_name = model_name
+        self.async_client = None
         
         # Extract size
         size = "3B" if "3b" in model_name else "1B" if "1b" in model_name else "3.8B"
@@ -27,9 +32,8 @@ class OpenRouterSLM:
         print(f"   Model: {model_name}")
         print(f"   Size: {size} (SLM)\n")
     
-    def generate_answer(self, query, context, max_tokens=300):
-        """Generate answer using OpenRouter"""
-        
+    def build_messages(self, query, context):
+        """Chat messages for a curriculum question"""
         system_prompt = """You are a helpful curriculum assistant for International University (IU).
 
     CRITICAL: When asked about PREREQUISITES:
@@ -60,13 +64,17 @@ Question: {query}
 
 Provide a clear, concise answer:"""
 
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def generate_answer(self, query, context, max_tokens=300):
+        """Generate answer using OpenRouter"""
         try:
             response = self.client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=self.build_messages(query, context),
                 max_tokens=max_tokens,
                 temperature=0.3,
             )
@@ -75,6 +83,101 @@ Provide a clear, concise answer:"""
             
         except Exception as e:
             return f"Error: {e}"
+    
+    def stream_answer(self, query, context, max_tokens=300, stats=None):
+        """
+        Yield the answer as it is generated (OpenRouter SSE stream)
+        
+        TTFT and tokens/sec of the call go into stats (a StreamStats owned
+        by the caller, so concurrent streams don't share it). On failure an
+        "Error: ..." chunk is yielded and stats.error is set.
+        """
+        stats = stats or StreamStats()
+        usage_tokens = None
+        
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=self.build_messages(query, context),
+                max_tokens=max_tokens,
+                temperature=0.3,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage_tokens = chunk.usage.completion_tokens
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    stats.chunk(text)
+                    yield text
+                    
+        except Exception as e:
+            stats.error = str(e)
+            yield f"Error: {e}"
+        finally:
+            stats.finish(usage_tokens)
+    
+    def get_async_client(self):
+        if self.async_client is None:
+            self.async_client = AsyncOpenAI(
+                base_url="https://openrouter.ai/api/v1",
+                api_key=os.getenv('OPENROUTER_API_KEY')
+            )
+        return self.async_client
+    
+    async def generate_answer_async(self, query, context, max_tokens=300):
+        """Non-blocking generate_answer for the asyncio pipeline"""
+        try:
+            response = await self.get_async_client().chat.completions.create(
+                model=self.model_name,
+                messages=self.build_messages(query, context),
+                max_tokens=max_tokens,
+                temperature=0.3,
+            )
+            
+            return response.choices[0].message.content
+            
+        except Exception as e:
+            return f"Error: {e}"
+
+    async def stream_answer_async(self, query, context, max_tokens=300, stats=None):
+        """Async generator version of stream_answer for the asyncio pipeline"""
+        stats = stats or StreamStats()
+        usage_tokens = None
+        stream = None
+        
+        try:
+            stream = await self.get_async_client().chat.completions.create(
+                model=self.model_name,
+                messages=self.build_messages(query, context),
+                max_tokens=max_tokens,
+                temperature=0.3,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage_tokens = chunk.usage.completion_tokens
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    stats.chunk(text)
+                    yield text
+                    
+        except Exception as e:
+            stats.error = str(e)
+            yield f"Error: {e}"
+        finally:
+            stats.finish(usage_tokens)
+            if stream is not None:
+                # Release the HTTP connection when the consumer stops early
+                await stream.close()
 
 # Test
 if __name__ == "__main__":
@@ -106,4 +209,13 @@ Description: Supervised and unsupervised learning algorithms"""
     print("ANSWER:")
     print("=" * 60)
     print(answer)
+    print()
+    
+    print("=" * 60)
+    print("STREAMED ANSWER:")
+    print("=" * 60)
+    stats = StreamStats()
+    for text in slm.stream_answer(query, context, stats=stats):
+        print(text, end="", flush=True)
+    stats.report("OpenRouter stream")
     print()
\ No newline at end of file
@@ -0,0 +1,55 @@
+import time
+
+
+class StreamStats:
+    """
+    Latency numbers for one streamed completion
+
+    ttft: seconds from request to first non-empty chunk (what users feel)
+    tokens_per_sec: generated tokens / time spent generating after the first
+    error: set when the stream failed part-way (the text is then incomplete)
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.end = None
+        self.tokens = 0
+        self.error = None
+
+    def chunk(self, text, tokens=1):
+        if text and self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += tokens
+
+    def finish(self, tokens=None):
+        self.end = time.perf_counter()
+        if tokens is not None:
+            # Exact count reported by the backend (e.g. OpenRouter usage)
+            self.tokens = tokens
+
+    @property
+    def ttft(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.start
+
+    @property
+    def tokens_per_sec(self):
+        if self.first_token_at is None or self.end is None or self.end <= self.first_token_at:
+            return 0.0
+        return self.tokens / (self.end - self.first_token_at)
+
+    def as_dict(self):
+        return {
+            'ttft_ms': round(self.ttft * 1000, 1) if self.ttft is not None else None,
+            'total_ms': round((self.end - self.start) * 1000, 1) if self.end else None,
+            'tokens': self.tokens,
+            'tokens_per_sec': round(self.tokens_per_sec, 1),
+            'error': self.error,
+        }
+
+    def report(self, label):
+        stats = self.as_dict()
+        print(f"\n⏱️  {label}: TTFT {stats['ttft_ms']} ms, "
+              f"{stats['tokens']} tokens, {stats['tokens_per_sec']} tokens/sec")
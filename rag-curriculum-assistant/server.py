@@ -0,0 +1,314 @@
+# server.py
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import json
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from config import Config
+from data.payload_filter import FILTER_FIELDS
+from rag.streaming import StreamStats
+
+class CurriculumService:
+    """
+    Per-worker shared resources
+
+    HybridRAG (embedding model, vector backend, SQL pool, LLM clients) is
+    built once per worker process. Requests are served by handler threads
+    that submit coroutines to one event loop running in a background
+    thread, so many questions can be in flight at once.
+    """
+    
+    def __init__(self):
+        from test_rag_hybrid import HybridRAG
+        
+        self.rag = HybridRAG()
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, name="rag-loop", daemon=True)
+        self.loop_thread.start()
+        
+        self.in_flight = 0
+        self.lock = threading.Lock()
+    
+    def run(self, coro, timeout):
+        """Run a coroutine on the worker loop, cancelling it after timeout seconds"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        with self.lock:
+            self.in_flight += 1
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+    
+    def ask(self, query, timeout=None):
+        return self.run(self.rag.ask_async(query), timeout or Config.REQUEST_TIMEOUT)
+    
+    def ask_stream(self, query, stats=None, timeout=None):
+        """
+        Yield answer chunks produced on the worker loop
+        
+        The whole stream shares one deadline; past it the pending chunk is
+        cancelled (which closes the upstream LLM stream) and FutureTimeout
+        is raised to the handler thread.
+        """
+        deadline = time.monotonic() + (timeout or Config.REQUEST_TIMEOUT)
+        chunks = self.rag.ask_stream_async(query, stats)
+        with self.lock:
+            self.in_flight += 1
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise FutureTimeout()
+                future = asyncio.run_coroutine_threadsafe(chunks.__anext__(), self.loop)
+                try:
+                    yield future.result(timeout=remaining)
+                except StopAsyncIteration:
+                    return
+                except FutureTimeout:
+                    future.cancel()
+                    raise
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            # Runs the generator's cleanup (latency record, upstream close) on the
+            # loop; after a cancelled chunk the generator has already finished
+            try:
+                asyncio.run_coroutine_threadsafe(chunks.aclose(), self.loop).result(timeout=5)
+            except Exception:
+                pass
+    
+    def search(self, query, top_k=None, filters=None, timeout=None):
+        results = self.run(
+            self.rag.search_courses_async(query, top_k or Config.TOP_K, filters),
+            timeout or Config.REQUEST_TIMEOUT
+        )
+        return [
+            {
+                'course_id': r.payload['course_id'],
+                'course_name': r.payload['course_name'],
+                'name_vn': r.payload.get('name_vn', ''),
+                'credits': r.payload['credits_theory'] + r.payload['credits_lab'],
+                'score': r.score,
+            }
+            for r in results
+        ]
+    
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=5)
+        self.rag.mysql.close()
+
+class RequestHandler(BaseHTTPRequestHandler):
+    service = None  # set per worker
+    
+    # Chunked responses need HTTP/1.1; connections are still closed after each
+    # request so graceful shutdown never waits on idle keep-alive sockets
+    protocol_version = "HTTP/1.1"
+    
+    def end_headers(self):
+        self.send_header("Connection", "close")
+        self.close_connection = True
+        super().end_headers()
+    
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def read_params(self):
+        """Query string for GET, JSON body for POST"""
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        if self.command == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("JSON body must be an object")
+                params.update(body)
+        return parsed.path, params
+    
+    def handle_request(self):
+        try:
+            path, params = self.read_params()
+        except (ValueError, json.JSONDecodeError):
+            self.send_json(400, {'error': 'Invalid JSON body'})
+            return
+        
+        if path == "/health":
+            self.send_json(200, {
+                'status': 'ok',
+                'pid': os.getpid(),
+                'in_flight': self.service.in_flight,
+                'routes': self.service.rag.latency.stats(),
+            })
+            return
+        
+        if path not in ("/ask", "/search"):
+            self.send_json(404, {'error': f'Unknown endpoint: {path}'})
+            return
+        
+        query = params.get("query") or params.get("q") or ""
+        if not isinstance(query, str):
+            self.send_json(400, {'error': "'query' must be a string"})
+            return
+        query = query.strip()
+        if not query:
+            self.send_json(400, {'error': "Missing 'query'"})
+            return
+        
+        if path == "/ask" and str(params.get("stream", "")).lower() in ("1", "true", "yes"):
+            self.stream_answer(query)
+            return
+        
+        try:
+            filters = self.read_filters(params)
+            top_k = int(params.get("top_k") or 0) or None
+        except (TypeError, ValueError):
+            self.send_json(400, {'error': "'top_k', 'credits' and 'course_level_id' must be integers"})
+            return
+        
+        start = time.perf_counter()
+        try:
+            if path == "/ask":
+                body = {'query': query, 'answer': self.service.ask(query)}
+            else:
+                body = {'query': query, 'results': self.service.search(query, top_k, filters)}
+        except FutureTimeout:
+            self.send_json(504, {'error': f'Timed out after {Config.REQUEST_TIMEOUT}s'})
+            return
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            return
+        
+        body['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        self.send_json(200, body)
+    
+    def read_filters(self, params):
+        """Explicit program / credits / course_level_id params, or None to take them from the query"""
+        filters = {field: params[field] for field in FILTER_FIELDS if params.get(field) not in (None, "")}
+        for field in ('credits', 'course_level_id'):
+            if field in filters:
+                filters[field] = int(filters[field])
+        return filters or None
+    
+    def stream_answer(self, query):
+        """Send answer text as it is generated (chunked transfer encoding)"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        stats = StreamStats()
+        try:
+            for text in self.service.ask_stream(query, stats):
+                self.write_chunk(text)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-answer
+            return
+        except FutureTimeout:
+            self.write_chunk(f"\nError: Timed out after {Config.REQUEST_TIMEOUT}s")
+        except Exception as e:
+            self.write_chunk(f"\nError: {e}")
+        self.wfile.write(b"0\r\n\r\n")
+        stats.report(f"Stream {os.getpid()}")
+    
+    def write_chunk(self, text):
+        data = text.encode("utf-8")
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+    
+    def do_GET(self):
+        self.handle_request()
+    
+    def do_POST(self):
+        self.handle_request()
+
+def serve_worker(sock):
+    """Build shared resources once and serve on an already-bound socket"""
+    RequestHandler.service = CurriculumService()
+    
+    server = ThreadingHTTPServer(sock.getsockname()[:2], RequestHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    # Wait for in-flight requests on shutdown
+    server.daemon_threads = False
+    server.block_on_close = True
+    
+    def shutdown(signum, frame):
+        # shutdown() blocks until serve_forever returns, so call it from another thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    
+    print(f"✅ Worker {os.getpid()} serving on http://{Config.SERVER_HOST}:{Config.SERVER_PORT}")
+    server.serve_forever()
+    
+    server.server_close()  # joins request threads
+    RequestHandler.service.close()
+    print(f"👋 Worker {os.getpid()} stopped")
+
+def main():
+    workers = Config.SERVER_WORKERS
+    
+    # Bind once in the parent; forked workers accept on the shared socket
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((Config.SERVER_HOST, Config.SERVER_PORT))
+    sock.listen(128)
+    
+    if workers <= 1 or not hasattr(os, "fork"):
+        serve_worker(sock)
+        return
+    
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve_worker(sock)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    
+    def forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    
+    for pid in children:
+        while True:
+            try:
+                os.waitpid(pid, 0)
+                break
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+    sock.close()
+
+if __name__ == "__main__":
+    main()
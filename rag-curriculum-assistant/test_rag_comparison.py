@@ -4,10 +4,9 @@ import os
 import time
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from sentence_transformers import SentenceTransformer
-from data.qdrant_connector import QdrantConnector
-from rag.slm_openrouter import OpenRouterSLM
-from groq import Groq
+from data.vector_backend import create_vector_backend
+from rag.lazy import LazyLoader, get_embedding_model, load_openrouter_slm, load_groq_client
+from rag.embedding_cache import get_query_embedding_cache
 from config import Config
 
 class RAGComparison:
@@ -16,39 +15,34 @@ class RAGComparison:
         print("   Loading both SLM and LLM...\n")
         
         # Shared components
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.qdrant = QdrantConnector()
+        self.embedding_model = get_embedding_model(Config.EMBEDDING_MODEL)
+        self.embedding_model.warm()
+        self.embedding_cache = get_query_embedding_cache()
+        self.qdrant = LazyLoader(create_vector_backend, "Vector backend")
+        self.qdrant.warm()
         
         # SLM: LLaMA 3.2 3B (OpenRouter)
         print(" Loading SLM (LLaMA 3.2 3B)...")
-        self.slm = OpenRouterSLM("meta-llama/llama-3.2-3b-instruct")
+        self.slm = LazyLoader(load_openrouter_slm, "SLM (OpenRouter)")
         
         # LLM: LLaMA 3.1 8B (Groq)
         print(" Loading LLM (LLaMA 3.1 8B)...")
-        self.groq = Groq(api_key=Config.GROQ_API_KEY)
+        self.groq = LazyLoader(load_groq_client, "Groq client")
         
         print(" Ready!\n")
     
     def search_courses(self, query, top_k=5):
         """Search (shared by both models)"""
-        query_vector = self.embedding_model.encode(query).tolist()
+        query_vector = self.embedding_cache.encode(self.embedding_model, query, Config.EMBEDDING_MODEL)
         
         results = self.qdrant.search(
             collection_name="curriculum",
             query_vector=query_vector,
-            limit=top_k * 3
+            limit=top_k
         )
         
-        # Deduplicate
-        seen = set()
-        unique = []
-        for r in results:
-            cid = r.payload['course_id']
-            if cid not in seen:
-                seen.add(cid)
-                unique.append(r)
-                if len(unique) >= top_k:
-                    break
+        # One point per course, so no deduplication needed
+        unique = results
         
         # Build info
         courses_info = []
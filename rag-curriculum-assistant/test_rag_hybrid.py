@@ -2,23 +2,57 @@
 import sys
 import os
 import re
+import asyncio
+import time
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from sentence_transformers import SentenceTransformer
-from data.qdrant_connector import QdrantConnector
+IMPORT_START = time.perf_counter()
+
+from data.vector_backend import create_vector_backend
 from data.mysql_connector import MySQLConnector
-from rag.slm_openrouter import OpenRouterSLM
+from data.prerequisite_graph import PrerequisiteGraph
+from data.course_resolver import CourseResolver, fold_text
+from rag.lazy import LazyLoader, get_embedding_model, load_slm
+from rag.embedding_cache import get_query_embedding_cache
+from rag.answer_cache import AnswerCache
+from rag.latency import RouteLatency
+from rag.hybrid_search import HybridRetriever
+from rag.reranker import CrossEncoderReranker
+from rag.streaming import StreamStats
 from config import Config
 
+IMPORT_SECONDS = time.perf_counter() - IMPORT_START
+
 class HybridRAG:
     def __init__(self):
         print(" Initializing Hybrid RAG System...")
         
         print(" Loading components...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.qdrant = QdrantConnector()
+        start = time.perf_counter()
+        
+        # Heavy components load on first use. Embedding model and vector index
+        # start loading in the background right away, so SQL-routed questions
+        # can be answered while MiniLM is still coming up.
+        self.embedding_model = get_embedding_model(Config.EMBEDDING_MODEL)
+        self.embedding_cache = get_query_embedding_cache()
+        self.qdrant = LazyLoader(create_vector_backend, "Vector backend")
+        self.slm = LazyLoader(load_slm, f"SLM ({Config.SLM_BACKEND})")
+        self.retriever = HybridRetriever(self.qdrant, "curriculum")
+        self.reranker = CrossEncoderReranker()
+        self.embedding_model.warm()
+        self.qdrant.warm()
+        self.reranker.warm()
+        
         self.mysql = MySQLConnector()
-        self.slm = OpenRouterSLM("meta-llama/llama-3.2-3b-instruct")
+        self.graph = PrerequisiteGraph(self.mysql)
+        self.graph.refresh()
+        self.resolver = CourseResolver(self.mysql)
+        self.resolver.refresh()
+        self.load_program_names()
+        self.answer_cache = AnswerCache()
+        self.latency = RouteLatency()
+        
+        self.init_seconds = time.perf_counter() - start
         
         print(" System Ready!\n")
     
@@ -48,17 +82,74 @@ class HybridRAG:
         
         return course_name.strip()
     
+    def load_program_names(self):
+        """Program names for filter extraction, folded and longest first"""
+        names = self.mysql.get_program_names()
+        self.program_names = sorted(
+            ((fold_text(name), name) for name in names if fold_text(name)),
+            key=lambda item: -len(item[0])
+        )
+    
+    def extract_filters(self, query):
+        """
+        Structured search filters mentioned in the question
+        
+        '3 credits' / '3-credit' / '3 tín chỉ' -> credits, 'level 2' ->
+        course_level_id, a known program name -> program. Returns {} when
+        the question mentions none.
+        """
+        filters = {}
+        query_lower = query.lower()
+        
+        credits = re.search(r'\b(\d{1,2})\s*-?\s*(?:credits?|tín chỉ|tin chi)\b', query_lower)
+        if credits:
+            filters['credits'] = int(credits.group(1))
+        
+        level = re.search(r'\blevel\s*(\d+)\b', query_lower)
+        if level:
+            filters['course_level_id'] = int(level.group(1))
+        
+        folded = f" {fold_text(query)} "
+        for name_folded, name in self.program_names:
+            if f" {name_folded} " in folded:
+                filters['program'] = name
+                break
+        
+        return filters
+    
     def classify_query(self, query):
         """
         Classify query type - IMPROVED LOGIC
         
         Returns:
+            'plan': Everything needed for X, and in what order
             'prerequisite': What does X need? (prerequisites for X)
             'dependent': What needs X? (courses that require X)
             'semantic': General search
         """
+        return self.classify_query_confidence(query)[0]
+    
+    def classify_query_confidence(self, query):
+        """
+        (query type, confident) - confident when an explicit phrase matched,
+        not when the type was guessed from the position of 'require'
+        """
         query_lower = query.lower()
         
+        # Pattern 0: "study plan for X", "in what order", "all prerequisites for X"
+        plan_patterns = [
+            'study plan',
+            'in what order',
+            'in which order',
+            'roadmap',
+            'all prerequisites',
+            'all prereqs',
+            'need to take before',
+        ]
+        
+        if any(pattern in query_lower for pattern in plan_patterns):
+            return 'plan', True
+        
         # Pattern 1: "prerequisites for X" or "what do I need before X"
         prerequisite_patterns = [
             'prerequisite',
@@ -70,7 +161,7 @@ class HybridRAG:
         ]
         
         if any(pattern in query_lower for pattern in prerequisite_patterns):
-            return 'prerequisite'
+            return 'prerequisite', True
         
         # Pattern 2: "which courses require X" or "what requires X"
         dependent_patterns = [
@@ -83,42 +174,105 @@ class HybridRAG:
         ]
         
         if any(pattern in query_lower for pattern in dependent_patterns):
-            return 'dependent'
+            return 'dependent', True
         
         # Pattern 3: Check word order for "require X" vs "require for X"
         if 'require' in query_lower:
             # "require MA001" or "require calculus" → dependent
             # "require for IT079" → prerequisite
             if 'for' in query_lower and query_lower.index('require') < query_lower.index('for'):
-                return 'prerequisite'
+                return 'prerequisite', False
             else:
-                return 'dependent'
+                return 'dependent', False
         
         # Default: semantic search
-        return 'semantic'
+        return 'semantic', False
+    
+    def find_course(self, identifier):
+        """Ranked course matches from the in-memory resolver (SQL LIKE if it couldn't load)"""
+        courses = self.resolver.find_course_by_name(identifier)
+        if courses is None:
+            courses = self.mysql.find_course_by_name(identifier)
+        return courses
     
-    def search_courses(self, query, top_k=5):
-        """Semantic search for courses"""
-        query_vector = self.embedding_model.encode(query).tolist()
+    def resolve_course_exact(self, query):
+        """
+        Course row if the query names exactly one known course, else None
         
-        results = self.qdrant.search(
-            collection_name="curriculum",
-            query_vector=query_vector,
-            limit=top_k * 3
-        )
+        A single course ID is looked up in the in-memory graph; otherwise the
+        extracted name has to match a course's English or Vietnamese name exactly
+        (case and diacritics aside).
+        """
+        course_ids = set(re.findall(r'\b[A-Z]{2,4}\d{3,4}\b', query.upper()))
+        if len(course_ids) == 1:
+            return self.graph.get_course(course_ids.pop())
+        if course_ids:
+            return None
+        
+        identifier = self.extract_course_identifier(query).lower()
+        if not identifier:
+            return None
+        
+        courses = self.find_course(identifier) or []
+        exact = [
+            c for c in courses
+            if c.get('score', 0) >= 1.0
+            or identifier in ((c.get('name') or '').lower(), (c.get('name_vn') or '').lower())
+        ]
+        return exact[0] if len(exact) == 1 else None
+    
+    def fast_answer(self, query, query_type):
+        """
+        Templated answer for a confidently classified SQL route, or None
+        
+        Touches only the prerequisite graph / SQL pool - never the embedding
+        model, the vector backend or an LLM.
+        """
+        if query_type == 'plan':
+            targets, _ = self.extract_plan_courses(query)
+            if not targets or any(self.graph.get_course(t) is None for t in targets):
+                return None
+            return self.handle_plan_query(query)[1]
+        
+        if query_type not in ('prerequisite', 'dependent'):
+            return None
+        
+        course = self.resolve_course_exact(query)
+        if course is None:
+            return None
+        if query_type == 'prerequisite':
+            return self.answer_prerequisites(course)
+        return self.answer_dependents(course)
+    
+    def search_courses(self, query, top_k=5, filters=None, implicit=None):
+        """
+        Dense + BM25 search for courses, fused by rank, optionally reranked
         
-        # Deduplicate
-        seen = set()
-        unique = []
-        for r in results:
-            cid = r.payload['course_id']
-            if cid not in seen:
-                seen.add(cid)
-                unique.append(r)
-                if len(unique) >= top_k:
-                    break
+        filters=None takes them from the question (extract_filters). They are
+        applied inside the backends, before top-k; if filters taken from the
+        question match nothing, the search is repeated without them.
+        implicit=True marks filters the caller already extracted from the
+        question, so they get the same fallback.
+        """
+        query_vector = self.embedding_cache.encode(self.embedding_model, query, Config.EMBEDDING_MODEL)
+        if implicit is None:
+            implicit = filters is None
+        if filters is None and implicit:
+            filters = self.extract_filters(query)
+        
+        results = self.retrieve(query, query_vector, top_k, filters)
+        if not results and filters and implicit:
+            print(f"ℹ️  No courses match {filters}, searching without filters")
+            results = self.retrieve(query, query_vector, top_k, None)
+        return results
+    
+    def retrieve(self, query, query_vector, top_k, filters):
+        # One point per course, so no deduplication needed
+        if not self.reranker.enabled:
+            return self.retriever.search(query, query_vector, limit=top_k, filters=filters)
         
-        return unique
+        candidates = self.retriever.search(query, query_vector, limit=max(top_k, self.reranker.candidates), filters=filters)
+        return self.reranker.rerank(query, candidates, top_k)
     
     def handle_prerequisite_query(self, query):
         """Handle prerequisite questions using SQL"""
@@ -131,7 +285,7 @@ class HybridRAG:
         print(f"   Looking for course: '{course_identifier}'\n")
         
         # Find course
-        courses = self.mysql.find_course_by_name(course_identifier)
+        courses = self.find_course(course_identifier)
         
         if not courses:
             print(" Course not found in database\n")
@@ -145,13 +299,22 @@ class HybridRAG:
         
         print(f" Found course: {course_id}: {course_name}\n")
         
-        # Get prerequisites
-        prereqs = self.mysql.get_prerequisites(course_id)
+        return course, self.answer_prerequisites(course)
+    
+    def answer_prerequisites(self, course):
+        """Templated prerequisite answer for a resolved course"""
+        course_id = course['id']
+        course_name = course['name']
+        
+        # Get prerequisites (in-memory graph, SQL if it couldn't be loaded)
+        prereqs = self.graph.get_prerequisites(course_id)
+        if prereqs is None:
+            prereqs = self.mysql.get_prerequisites(course_id)
         
         if not prereqs:
             answer = f" {course_id} ({course_name}) has NO prerequisites.\n"
             answer += "This course can be taken without prior coursework."
-            return course, answer
+            return answer
         
         # Format answer
         answer = f"Prerequisites for {course_id} ({course_name}):\n\n"
@@ -180,7 +343,7 @@ class HybridRAG:
             
             answer += "\n"
         
-        return course, answer
+        return answer
     
     def handle_dependent_query(self, query):
         """Handle 'what requires X' questions"""
@@ -193,7 +356,7 @@ class HybridRAG:
         print(f"   Looking for course: '{course_identifier}'\n")
         
         # Find course
-        courses = self.mysql.find_course_by_name(course_identifier)
+        courses = self.find_course(course_identifier)
         
         if not courses:
             print(" Course not found in database\n")
@@ -205,13 +368,22 @@ class HybridRAG:
         
         print(f" Found course: {course_id}: {course_name}\n")
         
-        # Get dependent courses
-        dependents = self.mysql.get_dependent_courses(course_id)
+        return course, self.answer_dependents(course)
+    
+    def answer_dependents(self, course):
+        """Templated 'what requires X' answer for a resolved course"""
+        course_id = course['id']
+        course_name = course['name']
+        
+        # Get dependent courses (in-memory graph, SQL if it couldn't be loaded)
+        dependents = self.graph.get_dependent_courses(course_id)
+        if dependents is None:
+            dependents = self.mysql.get_dependent_courses(course_id)
         
         if not dependents:
             answer = f" No courses require {course_id} ({course_name}) as prerequisite.\n"
             answer += "This course is not a prerequisite for any other courses in the current curriculum."
-            return course, answer
+            return answer
         
         # Format answer
         answer = f"Courses that require {course_id} ({course_name}) as prerequisite:\n\n"
@@ -231,15 +403,79 @@ class HybridRAG:
             
             answer += "\n"
         
-        return course, answer
+        return answer
+    
+    def extract_plan_courses(self, query):
+        """
+        Split course IDs in a plan question into targets and completed courses
+        
+        IDs after words like 'completed' / 'taken' / 'passed' count as done,
+        e.g. "study plan for IT079, I have completed IT001 and IT002".
+        """
+        course_id_pattern = r'\b[A-Z]{2,4}\d{3,4}\b'
+        parts = re.split(r'\b(?:completed|taken|passed|finished|already)\b', query, maxsplit=1, flags=re.IGNORECASE)
+        
+        targets = re.findall(course_id_pattern, parts[0].upper())
+        completed = re.findall(course_id_pattern, parts[1].upper()) if len(parts) > 1 else []
+        
+        if not targets:
+            # No ID given: resolve the course name instead
+            courses = self.find_course(self.extract_course_identifier(parts[0]))
+            if courses:
+                targets = [courses[0]['id']]
+        
+        return targets, completed
+    
+    def handle_plan_query(self, query):
+        """Handle 'everything I need for X, and in what order' questions"""
+        print(" Query Type: STUDY PLAN")
+        print("   (All prerequisites of X, ordered by semester)")
+        print("   Using prerequisite graph...\n")
+        
+        targets, completed = self.extract_plan_courses(query)
+        print(f"   Targets: {targets}, completed: {completed}\n")
+        
+        if not targets:
+            print(" Course not found in database\n")
+            return None, "Course not found. Please check the course ID or name."
+        
+        plan = self.graph.plan_study(targets, completed)
+        if plan is None:
+            return None, "Prerequisite data is not available right now."
+        
+        answer = f"Study plan for {', '.join(targets)}"
+        if completed:
+            answer += f" (already completed: {', '.join(completed)})"
+        answer += f", max {Config.MAX_CREDITS_PER_SEMESTER} credits per semester:\n\n"
+        
+        if not plan['semesters'] and not plan['blocked']:
+            answer += "Nothing left to take - all prerequisites are completed.\n"
+        
+        for n, semester in enumerate(plan['semesters'], 1):
+            credits = sum((c.get('credit_theory') or 0) + (c.get('credit_lab') or 0) for c in semester)
+            answer += f"Semester {n} ({credits} credits):\n"
+            for course in semester:
+                answer += f"   - {course['id']}: {course['name']}\n"
+            answer += "\n"
+        
+        if plan['blocked']:
+            answer += f"Could not order (prerequisite cycle in curriculum data): {', '.join(plan['blocked'])}\n"
+        if plan['unknown']:
+            answer += f"Unknown courses: {', '.join(plan['unknown'])}\n"
+        
+        return targets, answer
     
     def handle_semantic_query(self, query, top_k=5):
         """Handle general queries with semantic search + SLM"""
         print("🔍 Query Type: SEMANTIC SEARCH")
         print("   Using vector search + SLM\n")
         
-        # Search
-        results = self.search_courses(query, top_k)
+        filters = self.extract_filters(query)
+        if filters:
+            print(f"🔎 Filters: {filters}\n")
+        
+        # Search (falls back to no filters, and says so, if these match nothing)
+        results = self.search_courses(query, top_k, filters=filters or None, implicit=True)
         
         if not results:
             return "No relevant courses found"
@@ -247,24 +483,45 @@ class HybridRAG:
         print(f"📚 Found {len(results)} courses:\n")
         
         # Display
-        courses_info = []
         for i, result in enumerate(results, 1):
             payload = result.payload
             print(f"{i}. {payload['course_id']}: {payload['course_name']}")
             print(f"   Score: {result.score:.3f}")
+            if payload.get('chunk_type') not in (None, 'course'):
+                print(f"   Matched: {payload['chunk_type']}")
             if payload.get('name_vn'):
                 print(f"   Vietnamese: {payload['name_vn']}")
             print()
-            
+        
+        courses_info, context = self.build_context(results)
+        
+        # Cached answer for the same question over the same retrieved courses?
+        cache_key, version, answer = self.lookup_answer(query, courses_info)
+        if answer is not None:
+            print(" Answer served from cache\n")
+            return answer
+        
+        # Generate
+        print(" Generating answer with SLM...\n")
+        answer = self.slm.generate_answer(query, context, max_tokens=300)
+        self.store_answer(cache_key, version, answer)
+        
+        return answer
+    
+    def build_context(self, results):
+        """Course summaries and LLM context from search results"""
+        courses_info = []
+        for result in results:
+            payload = result.payload
             courses_info.append({
                 'id': payload['course_id'],
                 'name': payload['course_name'],
                 'name_vn': payload.get('name_vn', ''),
                 'description': payload.get('description', ''),
                 'credits': payload['credits_theory'] + payload['credits_lab'],
+                'matched': self.matched_chunk(payload),
             })
         
-        # Build context
         context = "Relevant courses:\n\n"
         for i, course in enumerate(courses_info, 1):
             context += f"{i}. {course['id']}: {course['name']}\n"
@@ -273,13 +530,32 @@ class HybridRAG:
             context += f"   Credits: {course['credits']}\n"
             if course['description']:
                 context += f"   {course['description'][:150]}...\n"
+            if course['matched']:
+                context += f"   Matched: {course['matched']}\n"
             context += "\n"
         
-        # Generate
-        print(" Generating answer with SLM...\n")
-        answer = self.slm.generate_answer(query, context, max_tokens=300)
-        
-        return answer
+        return courses_info, context
+    
+    def matched_chunk(self, payload):
+        """Text of the description / outcome / topic chunk a hit came from (None for the course summary)"""
+        if payload.get('chunk_type') in (None, 'course') or not payload.get('text'):
+            return None
+        # Drop the 'Course X: name. ' header every chunk starts with
+        return payload['text'].split('. ', 1)[-1][:300]
+    
+    def lookup_answer(self, query, courses_info):
+        """Answer cache lookup: returns (cache_key, collection version, answer or None)"""
+        cache_key = AnswerCache.make_key(
+            query, 'semantic', [c['id'] for c in courses_info],
+            self.slm.model_name, self.slm.PROMPT_VERSION
+        )
+        version = self.qdrant.get_collection_version("curriculum")
+        return cache_key, version, self.answer_cache.get(cache_key, version)
+    
+    def store_answer(self, cache_key, version, answer):
+        # Never cache failed generations
+        if answer and not answer.startswith("Error:"):
+            self.answer_cache.put(cache_key, answer, version)
     
     def ask(self, query):
         """Main query handler with improved routing"""
@@ -288,18 +564,35 @@ class HybridRAG:
         print("=" * 60)
         print()
         
+        start = time.perf_counter()
+        
         # Classify query type
-        query_type = self.classify_query(query)
+        query_type, confident = self.classify_query_confidence(query)
         
-        # Route to handler
-        if query_type == 'prerequisite':
-            course, answer = self.handle_prerequisite_query(query)
-            
-        elif query_type == 'dependent':
-            course, answer = self.handle_dependent_query(query)
+        # Confident structured question about a known course: templated SQL
+        # answer without touching the embedding model, vector search or LLM
+        answer = self.fast_answer(query, query_type) if confident else None
+        route = f"{query_type}:fast"
+        
+        if answer is None:
+            route = query_type
             
-        else:  # semantic
-            answer = self.handle_semantic_query(query)
+            # Route to handler
+            if query_type == 'plan':
+                course, answer = self.handle_plan_query(query)
+                
+            elif query_type == 'prerequisite':
+                course, answer = self.handle_prerequisite_query(query)
+                
+            elif query_type == 'dependent':
+                course, answer = self.handle_dependent_query(query)
+                
+            else:  # semantic
+                answer = self.handle_semantic_query(query)
+        
+        elapsed = time.perf_counter() - start
+        self.latency.record(route, elapsed)
+        print(f" Route: {route} ({elapsed * 1000:.2f} ms)\n")
         
         # Display
         print("=" * 60)
@@ -307,6 +600,260 @@ class HybridRAG:
         print("=" * 60)
         print(answer)
         print("\n")
+        
+        return answer
+    
+    # ========== STREAMING ==========
+    
+    def ask_stream(self, query):
+        """
+        Generator version of ask(): yields answer text as it becomes available
+        
+        Same routing and fast path as ask(). SQL-routed answers come out as
+        one chunk; semantic answers are streamed token by token from the SLM,
+        so time-to-first-token is what the user waits for.
+        """
+        start = time.perf_counter()
+        query_type, confident = self.classify_query_confidence(query)
+        answer = self.fast_answer(query, query_type) if confident else None
+        route = f"{query_type}:fast"
+        
+        try:
+            if answer is not None:
+                yield answer
+                return
+            
+            route = query_type
+            if query_type == 'plan':
+                _, answer = self.handle_plan_query(query)
+                yield answer
+                return
+            
+            if query_type in ('prerequisite', 'dependent'):
+                courses = self.find_course(self.extract_course_identifier(query))
+                if courses:
+                    if query_type == 'prerequisite':
+                        yield self.answer_prerequisites(courses[0])
+                    else:
+                        yield self.answer_dependents(courses[0])
+                    return
+                if query_type == 'dependent':
+                    yield "Course not found. Please check the course ID or name."
+                    return
+            
+            yield from self.stream_semantic_answer(query)
+        finally:
+            self.latency.record(f"{route}:stream", time.perf_counter() - start)
+    
+    def stream_semantic_answer(self, query, top_k=5):
+        """Retrieve, then stream the SLM answer (cached answers come out whole)"""
+        results = self.search_courses(query, top_k)
+        if not results:
+            yield "No relevant courses found"
+            return
+        
+        courses_info, context = self.build_context(results)
+        cache_key, version, answer = self.lookup_answer(query, courses_info)
+        if answer is not None:
+            yield answer
+            return
+        
+        parts = []
+        stats = StreamStats()
+        for text in self.slm.stream_answer(query, context, max_tokens=300, stats=stats):
+            parts.append(text)
+            yield text
+        
+        # A stream that failed part-way holds a truncated answer plus the error
+        if stats.error is None:
+            self.store_answer(cache_key, version, "".join(parts))
+        stats.report("SLM stream")
+    
+    # ========== ASYNC PIPELINE ==========
+    
+    async def search_courses_async(self, query, top_k=5, filters=None):
+        """search_courses without blocking the event loop"""
+        # MiniLM encode is CPU-bound: run it off the loop
+        query_vector = await asyncio.to_thread(
+            self.embedding_cache.encode, self.embedding_model, query, Config.EMBEDDING_MODEL
+        )
+        implicit = filters is None
+        if implicit:
+            filters = self.extract_filters(query)
+        
+        results = await self.retrieve_async(query, query_vector, top_k, filters)
+        if not results and filters and implicit:
+            results = await self.retrieve_async(query, query_vector, top_k, None)
+        return results
+    
+    async def retrieve_async(self, query, query_vector, top_k, filters):
+        if not self.reranker.enabled:
+            return await self.retriever.search_async(query, query_vector, limit=top_k, filters=filters)
+        
+        candidates = await self.retriever.search_async(
+            query, query_vector, limit=max(top_k, self.reranker.candidates), filters=filters
+        )
+        return await asyncio.to_thread(self.reranker.rerank, query, candidates, top_k)
+    
+    async def answer_semantic_async(self, query, results):
+        """Context + (cached) LLM answer for already retrieved results"""
+        if not results:
+            return "No relevant courses found"
+        
+        courses_info, context = self.build_context(results)
+        # The collection version read can go to Qdrant: keep it off the loop
+        cache_key, version, answer = await asyncio.to_thread(self.lookup_answer, query, courses_info)
+        if answer is not None:
+            return answer
+        
+        answer = await self.slm.generate_answer_async(query, context, max_tokens=300)
+        self.store_answer(cache_key, version, answer)
+        return answer
+    
+    async def ask_async(self, query):
+        """
+        asyncio version of ask()
+        
+        For prerequisite questions the SQL course lookup and the vector search
+        start together. If SQL resolves the course the search is cancelled;
+        otherwise its results are already in flight for the semantic
+        fallback. SQL runs in worker threads over the connection pool.
+        Confident structured questions take the same SQL-only fast path as ask().
+        """
+        start = time.perf_counter()
+        query_type, confident = self.classify_query_confidence(query)
+        
+        if confident:
+            answer = await asyncio.to_thread(self.fast_answer, query, query_type)
+            if answer is not None:
+                self.latency.record(f"{query_type}:fast", time.perf_counter() - start)
+                return answer
+        
+        answer = await self.route_async(query, query_type)
+        self.latency.record(query_type, time.perf_counter() - start)
+        return answer
+    
+    async def route_async(self, query, query_type):
+        """Full async pipeline for one query type"""
+        if query_type == 'plan':
+            _, answer = await asyncio.to_thread(self.handle_plan_query, query)
+            return answer
+        
+        if query_type == 'dependent':
+            _, answer = await asyncio.to_thread(self.handle_dependent_query, query)
+            return answer
+        
+        if query_type == 'prerequisite':
+            course_identifier = self.extract_course_identifier(query)
+            lookup = asyncio.create_task(asyncio.to_thread(self.find_course, course_identifier))
+            search = asyncio.create_task(self.search_courses_async(query))
+            
+            try:
+                courses = await lookup
+            except BaseException:
+                await self.cancel_task(search)
+                raise
+            
+            if courses:
+                await self.cancel_task(search)
+                return await asyncio.to_thread(self.answer_prerequisites, courses[0])
+            
+            results = await search
+            return await self.answer_semantic_async(query, results)
+        
+        results = await self.search_courses_async(query)
+        return await self.answer_semantic_async(query, results)
+    
+    async def ask_stream_async(self, query, stats=None):
+        """
+        asyncio version of ask_stream(), with the routing and fast path of ask_async()
+        
+        stats (a StreamStats) gets the time to the first chunk of any route
+        and the SLM token rate; both land in self.latency as well, under
+        '<route>:stream' and '<route>:ttft'.
+        """
+        stats = stats or StreamStats()
+        start = time.perf_counter()
+        query_type, confident = self.classify_query_confidence(query)
+        route = query_type
+        
+        try:
+            answer = None
+            if confident:
+                answer = await asyncio.to_thread(self.fast_answer, query, query_type)
+            if answer is not None:
+                route = f"{query_type}:fast"
+                stats.chunk(answer, tokens=0)
+                yield answer
+                return
+            
+            async for text in self.route_stream_async(query, query_type, stats):
+                # Only marks the first chunk; the SLM counts its own tokens
+                stats.chunk(text, tokens=0)
+                yield text
+        finally:
+            stats.finish()
+            self.latency.record(f"{route}:stream", time.perf_counter() - start)
+            if stats.ttft is not None:
+                self.latency.record(f"{route}:ttft", stats.ttft)
+    
+    async def route_stream_async(self, query, query_type, stats):
+        """route_async() for streaming: SQL answers come out whole, semantic ones token by token"""
+        if query_type in ('plan', 'dependent'):
+            yield await self.route_async(query, query_type)
+            return
+        
+        if query_type == 'prerequisite':
+            # Same speculative search as route_async()
+            course_identifier = self.extract_course_identifier(query)
+            lookup = asyncio.create_task(asyncio.to_thread(self.find_course, course_identifier))
+            search = asyncio.create_task(self.search_courses_async(query))
+            
+            try:
+                courses = await lookup
+            except BaseException:
+                await self.cancel_task(search)
+                raise
+            
+            if courses:
+                await self.cancel_task(search)
+                yield await asyncio.to_thread(self.answer_prerequisites, courses[0])
+                return
+            results = await search
+        else:
+            results = await self.search_courses_async(query)
+        
+        async for text in self.stream_semantic_async(query, results, stats):
+            yield text
+    
+    async def stream_semantic_async(self, query, results, stats):
+        """Stream the SLM answer for already retrieved results (cached answers come out whole)"""
+        if not results:
+            yield "No relevant courses found"
+            return
+        
+        courses_info, context = self.build_context(results)
+        cache_key, version, answer = await asyncio.to_thread(self.lookup_answer, query, courses_info)
+        if answer is not None:
+            yield answer
+            return
+        
+        parts = []
+        async for text in self.slm.stream_answer_async(query, context, max_tokens=300, stats=stats):
+            parts.append(text)
+            yield text
+        
+        # Not reached when the consumer gave up early, so partial answers are never cached
+        if stats.error is None:
+            self.store_answer(cache_key, version, "".join(parts))
+    
+    async def cancel_task(self, task):
+        """Cancel a speculative task and wait for it, so it never outlives the query"""
+        task.cancel()
+        # asyncio.wait doesn't swallow a cancellation aimed at this query itself
+        await asyncio.wait([task])
+        if not task.cancelled():
+            task.exception()  # Mark a late failure as retrieved
 
 # Main
 def main():
@@ -317,11 +864,17 @@ def main():
     print()
     
     rag = HybridRAG()
+    print(f" Startup: imports {IMPORT_SECONDS * 1000:.0f} ms, init {rag.init_seconds * 1000:.0f} ms\n")
+    first_answer_pending = True
+    use_async = "--async" in sys.argv
+    use_stream = "--stream" in sys.argv
+    # One loop for the whole session: async clients are bound to the loop they were created on
+    loop = asyncio.new_event_loop() if use_async else None
     
     print("=" * 60)
     print(" INTERACTIVE MODE")
     print("=" * 60)
-    print("Type questions (or 'quit' to exit)\n")
+    print("Type questions ('refresh' to reload prerequisites, 'stats' for route latency, 'quit' to exit)\n")
     
     while True:
         try:
@@ -335,8 +888,37 @@ def main():
             if not query:
                 continue
             
+            if query.lower() == 'stats':
+                # Per-route latency of answered questions
+                rag.latency.report()
+                if rag.reranker.enabled:
+                    print(f" Reranker: {rag.reranker.stats()}")
+                print()
+                continue
+            
+            if query.lower() == 'refresh':
+                # Reload prerequisite graph and course names after curriculum changes
+                if rag.graph.refresh():
+                    print(f" Prerequisite graph reloaded: {rag.graph.stats()}\n")
+                if rag.resolver.refresh():
+                    print(f" Course resolver reloaded: {rag.resolver.stats()}\n")
+                rag.load_program_names()
+                continue
+            
             print()
-            rag.ask(query)
+            if use_stream:
+                for text in rag.ask_stream(query):
+                    print(text, end="", flush=True)
+                print("\n")
+            elif use_async:
+                print(loop.run_until_complete(rag.ask_async(query)))
+                print()
+            else:
+                rag.ask(query)
+            
+            if first_answer_pending:
+                first_answer_pending = False
+                print(f" Time to first answer: {time.perf_counter() - IMPORT_START:.2f}s since start\n")
             
         except KeyboardInterrupt:
             print("\n\n Goodbye!")
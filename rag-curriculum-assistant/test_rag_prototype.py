@@ -3,9 +3,9 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from sentence_transformers import SentenceTransformer
-from data.qdrant_connector import QdrantConnector
-from rag.slm_openrouter import OpenRouterSLM
+from data.vector_backend import create_vector_backend
+from rag.lazy import LazyLoader, get_embedding_model, load_openrouter_slm
+from rag.embedding_cache import get_query_embedding_cache
 from config import Config
 
 class SimpleRAG:
@@ -14,15 +14,18 @@ class SimpleRAG:
         
         # Load embedding model
         print(" Loading embedding model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = get_embedding_model(Config.EMBEDDING_MODEL)
+        self.embedding_model.warm()
+        self.embedding_cache = get_query_embedding_cache()
         
         # Connect to Qdrant
         print(" Connecting to Qdrant...")
-        self.qdrant = QdrantConnector()
+        self.qdrant = LazyLoader(create_vector_backend, "Vector backend")
+        self.qdrant.warm()
         
         # Load SLM via OpenRouter
         print(" Loading SLM (LLaMA 3.2 3B via OpenRouter)...")
-        self.slm = OpenRouterSLM("meta-llama/llama-3.2-3b-instruct")
+        self.slm = LazyLoader(load_openrouter_slm, "SLM (OpenRouter)")
         
         print(" System Ready!\n")
     
@@ -31,26 +34,17 @@ class SimpleRAG:
         print(f" Searching: '{query}'")
         
         # Generate embedding
-        query_vector = self.embedding_model.encode(query).tolist()
+        query_vector = self.embedding_cache.encode(self.embedding_model, query, Config.EMBEDDING_MODEL)
         
         # Search Qdrant (get more to account for duplicates)
         results = self.qdrant.search(
             collection_name="curriculum",
             query_vector=query_vector,
-            limit=top_k * 3  # Get 3x to deduplicate
+            limit=top_k
         )
         
-        # Deduplicate by course_id
-        seen_courses = set()
-        unique_results = []
-        
-        for result in results:
-            course_id = result.payload['course_id']
-            if course_id not in seen_courses:
-                seen_courses.add(course_id)
-                unique_results.append(result)
-                if len(unique_results) >= top_k:
-                    break
+        # One point per course, so no deduplication needed
+        unique_results = results
         
         print(f" Found {len(unique_results)} unique courses:\n")
         
@@ -3,8 +3,9 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from sentence_transformers import SentenceTransformer
-from data.qdrant_connector import QdrantConnector
+from data.vector_backend import create_vector_backend
+from rag.lazy import LazyLoader, get_embedding_model
+from rag.embedding_cache import get_query_embedding_cache
 from config import Config
 
 class SearchOnlyTest:
@@ -14,11 +15,14 @@ class SearchOnlyTest:
         
         # Load embedding model
         print(" Loading embedding model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = get_embedding_model(Config.EMBEDDING_MODEL)
+        self.embedding_model.warm()
+        self.embedding_cache = get_query_embedding_cache()
         
         # Connect to Qdrant
         print(" Connecting to Qdrant...")
-        self.qdrant = QdrantConnector()
+        self.qdrant = LazyLoader(create_vector_backend, "Vector backend")
+        self.qdrant.warm()
         
         print(" Ready!\n")
     
@@ -31,7 +35,7 @@ class SearchOnlyTest:
         
         # Generate embedding
         print(" Generating query embedding...")
-        query_vector = self.embedding_model.encode(query).tolist()
+        query_vector = self.embedding_cache.encode(self.embedding_model, query, Config.EMBEDDING_MODEL)
         print(f"   Vector dimension: {len(query_vector)}")
         print()
         
@@ -40,22 +44,13 @@ class SearchOnlyTest:
         results = self.qdrant.search(
             collection_name="curriculum",
             query_vector=query_vector,
-            limit=top_k * 3  # Get more for deduplication
+            limit=top_k
         )
         print(f"   Raw results: {len(results)}")
         print()
         
-        # Deduplicate by course_id
-        seen_courses = set()
-        unique_results = []
-        
-        for result in results:
-            course_id = result.payload['course_id']
-            if course_id not in seen_courses:
-                seen_courses.add(course_id)
-                unique_results.append(result)
-                if len(unique_results) >= top_k:
-                    break
+        # One point per course, so no deduplication needed
+        unique_results = results
         
         print(f" Found {len(unique_results)} unique courses:\n")
         
@@ -158,6 +153,13 @@ class SearchOnlyTest:
         if poor > 0:
             print(f"  Poor (<0.4): {poor}")
         print()
+        
+        # Query embedding cache
+        cache = self.embedding_cache.stats()
+        print("Query embedding cache:")
+        print(f"  Hits: {cache['hits']}, Misses: {cache['misses']} ({cache['hit_rate']:.0%} hit rate)")
+        print(f"  Encode time saved: {cache['saved_seconds'] * 1000:.1f} ms")
+        print()
     
     def batch_test(self, queries):
         """Test multiple queries"""
@@ -1,12 +1,16 @@
 # tests/validation_queries.py
 import sys
 import os
+import time
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from data.mysql_connector import MySQLConnector
-from sentence_transformers import SentenceTransformer
-from data.qdrant_connector import QdrantConnector
-from rag.slm_openrouter import OpenRouterSLM
+from data.vector_backend import create_vector_backend
+from rag.lazy import LazyLoader, get_embedding_model, load_openrouter_slm
+from rag.embedding_cache import get_query_embedding_cache
+from rag.hybrid_search import HybridRetriever
+from rag.reranker import CrossEncoderReranker
+from config import Config
 
 class ValidationTest:
     def __init__(self):
@@ -16,9 +20,15 @@ class ValidationTest:
         self.mysql = MySQLConnector()
         
         # RAG components
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.qdrant = QdrantConnector()
-        self.slm = OpenRouterSLM("meta-llama/llama-3.2-3b-instruct")
+        self.embedding_model = get_embedding_model(Config.EMBEDDING_MODEL)
+        self.embedding_model.warm()
+        self.embedding_cache = get_query_embedding_cache()
+        self.qdrant = LazyLoader(create_vector_backend, "Vector backend")
+        self.qdrant.warm()
+        self.slm = LazyLoader(load_openrouter_slm, "SLM (OpenRouter)")
+        self.retriever = HybridRetriever(self.qdrant, "curriculum")
+        # Always on here (no latency budget) so the trade-off can be measured
+        self.reranker = CrossEncoderReranker(enabled=True, budget_ms=0)
         
         print("✅ Ready!\n")
     
@@ -135,26 +145,13 @@ class ValidationTest:
     def query_rag(self, question, top_k=5):
         """Get answer from RAG system"""
         # Generate embedding
-        query_vector = self.embedding_model.encode(question).tolist()
+        query_vector = self.embedding_cache.encode(self.embedding_model, question, Config.EMBEDDING_MODEL)
         
-        # Search Qdrant
-        results = self.qdrant.search(
-            collection_name="curriculum",
-            query_vector=query_vector,
-            limit=top_k * 3
-        )
+        # Dense + BM25 search
+        results = self.retriever.search(question, query_vector, limit=top_k)
         
-        # Deduplicate
-        seen_courses = set()
-        unique_results = []
-        
-        for result in results:
-            course_id = result.payload['course_id']
-            if course_id not in seen_courses:
-                seen_courses.add(course_id)
-                unique_results.append(result)
-                if len(unique_results) >= top_k:
-                    break
+        # One point per course, so no deduplication needed
+        unique_results = results
         
         # Build context
         context = "Relevant courses:\n\n"
@@ -181,6 +178,39 @@ class ValidationTest:
             'context': context
         }
     
+    def retrieval_recall(self, question, sql_course_ids, top_k=5):
+        """Recall of dense-only vs hybrid (dense + BM25) retrieval, no LLM involved"""
+        query_vector = self.embedding_cache.encode(self.embedding_model, question, Config.EMBEDDING_MODEL)
+        dense = self.qdrant.search(collection_name="curriculum", query_vector=query_vector, limit=top_k)
+        hybrid = self.retriever.search(question, query_vector, limit=top_k)
+        
+        def recall(results):
+            found = {r.payload['course_id'] for r in results} & sql_course_ids
+            return len(found) / len(sql_course_ids) if sql_course_ids else 0
+        
+        dense_recall, hybrid_recall = recall(dense), recall(hybrid)
+        print(f"  Retrieval recall@{top_k}: dense {dense_recall:.2%} -> hybrid {hybrid_recall:.2%}")
+        return dense_recall, hybrid_recall
+    
+    def rerank_tradeoff(self, question, sql_course_ids, top_k=5):
+        """Precision@top_k of hybrid retrieval with and without cross-encoder rerank, and its cost"""
+        query_vector = self.embedding_cache.encode(self.embedding_model, question, Config.EMBEDDING_MODEL)
+        candidates = self.retriever.search(question, query_vector, limit=max(top_k, self.reranker.candidates))
+        
+        self.reranker.model.get()  # load outside the timing
+        start = time.perf_counter()
+        reranked = self.reranker.rerank(question, candidates, top_k, wait=True)
+        rerank_ms = (time.perf_counter() - start) * 1000
+        
+        def precision(results):
+            found = {r.payload['course_id'] for r in results} & sql_course_ids
+            return len(found) / len(results) if results else 0
+        
+        before, after = precision(candidates[:top_k]), precision(reranked)
+        print(f"  Rerank precision@{top_k}: {before:.2%} -> {after:.2%} "
+              f"({len(candidates)} candidates, {rerank_ms:.1f} ms)")
+        return after, rerank_ms
+    
     # ========== VALIDATION TESTS ==========
     
     def test_ai_courses(self):
@@ -219,6 +249,8 @@ class ValidationTest:
         print("📈 VALIDATION METRICS:")
         print(f"  Precision: {precision:.2%} ({len(correct)}/{len(retrieved_set)})")
         print(f"  Recall: {recall:.2%} ({len(correct)}/{len(sql_course_ids)})")
+        dense_recall, _ = self.retrieval_recall(question, sql_course_ids, top_k=5)
+        rerank_precision, rerank_ms = self.rerank_tradeoff(question, sql_course_ids, top_k=5)
         print(f"  Correctly retrieved: {correct}")
         print()
         
@@ -226,6 +258,9 @@ class ValidationTest:
             'test': 'AI Courses',
             'precision': precision,
             'recall': recall,
+            'dense_recall': dense_recall,
+            'rerank_precision': rerank_precision,
+            'rerank_ms': rerank_ms,
             'sql_count': len(sql_course_ids),
             'rag_count': len(retrieved_set)
         }
@@ -266,6 +301,8 @@ class ValidationTest:
         print("📈 VALIDATION METRICS:")
         print(f"  Precision: {precision:.2%} ({len(correct)}/{len(retrieved_set)})")
         print(f"  Recall: {recall:.2%} ({len(correct)}/{len(sql_course_ids)})")
+        dense_recall, _ = self.retrieval_recall(question, sql_course_ids, top_k=5)
+        rerank_precision, rerank_ms = self.rerank_tradeoff(question, sql_course_ids, top_k=5)
         print(f"  Correctly retrieved: {correct}")
         print()
         
@@ -273,6 +310,9 @@ class ValidationTest:
             'test': 'Database Courses',
             'precision': precision,
             'recall': recall,
+            'dense_recall': dense_recall,
+            'rerank_precision': rerank_precision,
+            'rerank_ms': rerank_ms,
             'sql_count': len(sql_course_ids),
             'rag_count': len(retrieved_set)
         }
@@ -395,12 +435,17 @@ class ValidationTest:
         print("📈 VALIDATION METRICS:")
         print(f"  Precision: {precision:.2%} ({len(correct)}/{len(retrieved_set)})")
         print(f"  Recall: {recall:.2%} ({len(correct)}/{len(sql_course_ids)})")
+        dense_recall, _ = self.retrieval_recall(question, sql_course_ids, top_k=10)
+        rerank_precision, rerank_ms = self.rerank_tradeoff(question, sql_course_ids, top_k=10)
         print()
         
         return {
             'test': 'Program Courses',
             'precision': precision,
             'recall': recall,
+            'dense_recall': dense_recall,
+            'rerank_precision': rerank_precision,
+            'rerank_ms': rerank_ms,
             'sql_count': len(sql_course_ids),
             'rag_count': len(retrieved_set)
         }
@@ -432,9 +477,15 @@ class ValidationTest:
         avg_precision = sum(r.get('precision', 0) for r in results if 'precision' in r) / len([r for r in results if 'precision' in r])
         avg_recall = sum(r.get('recall', 0) for r in results if 'recall' in r) / len([r for r in results if 'recall' in r])
         
+        recall_results = [r for r in results if 'dense_recall' in r]
+        avg_dense_recall = sum(r['dense_recall'] for r in recall_results) / len(recall_results)
+        
         print("Overall Metrics:")
         print(f"  Average Precision: {avg_precision:.2%}")
-        print(f"  Average Recall: {avg_recall:.2%}")
+        print(f"  Average Recall: {avg_recall:.2%} (dense only: {avg_dense_recall:.2%})")
+        avg_rerank_precision = sum(r['rerank_precision'] for r in recall_results) / len(recall_results)
+        avg_rerank_ms = sum(r['rerank_ms'] for r in recall_results) / len(recall_results)
+        print(f"  Average Precision with rerank: {avg_rerank_precision:.2%} (+{avg_rerank_ms:.1f} ms per query)")
         print()
         
         print("Test Results:")
@@ -442,10 +493,17 @@ class ValidationTest:
             print(f"  • {result['test']}:")
             if 'precision' in result:
                 print(f"    - Precision: {result['precision']:.2%}")
-                print(f"    - Recall: {result['recall']:.2%}")
+                print(f"    - Recall: {result['recall']:.2%} (dense only: {result['dense_recall']:.2%})")
+                print(f"    - Precision with rerank: {result['rerank_precision']:.2%} ({result['rerank_ms']:.1f} ms)")
             if 'note' in result:
                 print(f"    - {result['note']}")
         
+        cache = self.embedding_cache.stats()
+        print()
+        print("Query Embedding Cache:")
+        print(f"  Hits: {cache['hits']}, Misses: {cache['misses']} ({cache['hit_rate']:.0%} hit rate)")
+        print(f"  Encode time saved: {cache['saved_seconds'] * 1000:.1f} ms")
+        
         print()
         print("=" * 60)
         print("✅ VALIDATION COMPLETE!")